@@ -0,0 +1,54 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+ASYNC_ROUTES = (
+    "recipes-list",
+    "recipes-detail",
+    "recipes-download-shopping-cart",
+    "ingredients-list",
+    "ingredients-detail",
+    "tags-list",
+    "tags-detail",
+)
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def call_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def offload(view, reads_in_pool):
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        thread_sensitive = not (
+            reads_in_pool and request.method in READ_METHODS
+        )
+        return await sync_to_async(
+            call_view, thread_sensitive=thread_sensitive
+        )(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def async_patterns(patterns, names=ASYNC_ROUTES):
+    return [
+        URLPattern(
+            pattern.pattern,
+            offload(pattern.callback, pattern.name in names),
+            pattern.default_args,
+            pattern.name,
+        )
+        if isinstance(pattern, URLPattern)
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,486 @@
+import base64
+import json
+import math
+import subprocess
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+from itertools import combinations
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.test import Client
+from recipe.counters import COUNTERS, recount
+from recipe.images import ensure_image
+from recipe.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+    search_vector,
+)
+from rest_framework.authtoken.models import Token
+from users.models import Follow, User
+
+from .ingredient_index import invalidate_index
+from .middleware import QueryLog
+from .signals import VERSIONED_MODELS, collection_changed
+
+PREFIX = "bench"
+UNITS = ("г", "мл", "шт", "ст. л.", "ч. л.")
+
+DEFAULT_VOLUMES = {
+    "users": 50,
+    "tags": 6,
+    "ingredients": 500,
+    "recipes": 500,
+    "ingredients_per_recipe": 6,
+    "favorites": 10,
+    "carts": 5,
+    "follows": 5,
+}
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=f"{PREFIX}_")
+
+
+def is_seeded():
+    return bench_users().exists()
+
+
+def clear():
+    with transaction.atomic():
+        bench_users().delete()
+        Tag.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+        Ingredient.objects.filter(name__startswith=f"{PREFIX} ").delete()
+        for name in set(VERSIONED_MODELS.values()):
+            collection_changed(name)
+        transaction.on_commit(invalidate_index)
+
+
+def sample(rng, population, size):
+    return rng.sample(population, min(size, len(population)))
+
+
+@transaction.atomic
+def seed(volumes, rng, batch_size=1000):
+    password = make_password(None)
+    User.objects.bulk_create(
+        [
+            User(
+                username=f"{PREFIX}_{i}",
+                email=f"{PREFIX}_{i}@example.com",
+                first_name="Бенчмарк",
+                last_name=str(i),
+                password=password,
+            )
+            for i in range(volumes["users"])
+        ],
+        batch_size=batch_size,
+    )
+    users = list(bench_users().order_by("id"))
+    Tag.objects.bulk_create(
+        [
+            Tag(name=f"{PREFIX} {i}", color=f"#B{i:05X}", slug=f"{PREFIX}-{i}")
+            for i in range(volumes["tags"])
+        ]
+    )
+    tags = list(Tag.objects.filter(slug__startswith=f"{PREFIX}-"))
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(
+                name=f"{PREFIX} ингредиент {i}",
+                measurement_unit=rng.choice(UNITS),
+            )
+            for i in range(volumes["ingredients"])
+        ],
+        batch_size=batch_size,
+    )
+    ingredient_ids = list(
+        Ingredient.objects.filter(name__startswith=f"{PREFIX} ").values_list(
+            "id", flat=True
+        )
+    )
+    image = ensure_image()
+    Recipe.objects.bulk_create(
+        [
+            Recipe(
+                author=rng.choice(users),
+                name=f"Рецепт {i}",
+                text=f"Описание рецепта {i} для нагрузочного теста.",
+                cooking_time=rng.randint(1, 180),
+                image=image,
+            )
+            for i in range(volumes["recipes"])
+        ],
+        batch_size=batch_size,
+    )
+    recipes = Recipe.objects.filter(author__in=users)
+    recipe_ids = list(recipes.values_list("id", flat=True))
+    if connection.vendor == "postgresql":
+        recipes.update(search_vector=search_vector())
+    Through = Recipe.tags.through
+    Through.objects.bulk_create(
+        [
+            Through(recipe_id=recipe_id, tag_id=tag.id)
+            for recipe_id in recipe_ids
+            for tag in sample(rng, tags, rng.randint(1, 3))
+        ],
+        batch_size=batch_size,
+    )
+    IngredientInRecipe.objects.bulk_create(
+        [
+            IngredientInRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in sample(
+                rng,
+                ingredient_ids,
+                rng.randint(1, volumes["ingredients_per_recipe"]),
+            )
+        ],
+        batch_size=batch_size,
+    )
+    for model, volume in ((Favorite, "favorites"), (ShoppingCart, "carts")):
+        model.objects.bulk_create(
+            [
+                model(user=user, recipe_id=recipe_id)
+                for user in users
+                for recipe_id in sample(rng, recipe_ids, volumes[volume])
+            ],
+            batch_size=batch_size,
+        )
+    Follow.objects.bulk_create(
+        [
+            Follow(author=user, user=followed)
+            for user in users
+            for followed in sample(
+                rng,
+                [other for other in users if other != user],
+                volumes["follows"],
+            )
+        ],
+        batch_size=batch_size,
+    )
+    user_ids = [user.id for user in users]
+    for name, (model, *_) in COUNTERS.items():
+        recount(name, recipe_ids if model is Recipe else user_ids)
+    ShoppingListItem.objects.rebuild(user_ids)
+    for name in set(VERSIONED_MODELS.values()):
+        collection_changed(name)
+    transaction.on_commit(invalidate_index)
+
+
+class Context:
+    def __init__(self, rng):
+        self.user = (
+            bench_users()
+            .filter(favorite__isnull=False, shoppingcart__isnull=False)
+            .order_by("id")
+            .first()
+        )
+        self.token = Token.objects.get_or_create(user=self.user)[0].key
+        self.author = (
+            bench_users().order_by("-followers_count", "id").first()
+        )
+        recipes = Recipe.objects.filter(author__in=bench_users())
+        self.recipe_id = rng.choice(
+            list(recipes.values_list("id", flat=True)[:100])
+        )
+        self.other_recipe_id = (
+            recipes.exclude(favorite__user=self.user)
+            .exclude(shoppingcart__user=self.user)
+            .values_list("id", flat=True)
+            .first()
+        )
+        self.unfollowed_id = (
+            bench_users()
+            .exclude(id=self.user.id)
+            .exclude(follower__author=self.user)
+            .values_list("id", flat=True)
+            .first()
+        )
+        tags = list(Tag.objects.filter(slug__startswith=f"{PREFIX}-")[:2])
+        self.tag_ids = [tag.id for tag in tags]
+        self.tags = "&".join(f"tags={tag.slug}" for tag in tags)
+        self.ingredient_id = (
+            Ingredient.objects.filter(name__startswith=f"{PREFIX} ")
+            .values_list("id", flat=True)
+            .first()
+        )
+        with default_storage.open(ensure_image(), "rb") as f:
+            self.image_data = (
+                "data:image/png;base64," + base64.b64encode(f.read()).decode()
+            )
+
+
+RECIPE_FILTERS = {
+    "author": lambda ctx: f"author={ctx.author.id}",
+    "tags": lambda ctx: ctx.tags,
+    "is_favorited": lambda ctx: "is_favorited=1",
+    "is_in_shopping_cart": lambda ctx: "is_in_shopping_cart=1",
+    "search": lambda ctx: "search=рецепт",
+}
+
+
+def get(name, path, auth=True):
+    return (name, [("GET", path, None)], auth)
+
+
+def build_routes(ctx):
+    routes = []
+    for size in range(len(RECIPE_FILTERS) + 1):
+        for names in combinations(RECIPE_FILTERS, size):
+            query = "&".join(RECIPE_FILTERS[name](ctx) for name in names)
+            routes.append(
+                get(
+                    f"recipes list [{'+'.join(names) or 'no filters'}]",
+                    f"/api/recipes/?{query}",
+                )
+            )
+    recipe = f"/api/recipes/{ctx.recipe_id}/"
+    other = f"/api/recipes/{ctx.other_recipe_id}/"
+    created = {}
+
+    def recipe_data():
+        return {
+            "name": "Бенчмарк",
+            "text": "Рецепт для нагрузочного теста.",
+            "cooking_time": 10,
+            "image": ctx.image_data,
+            "tags": ctx.tag_ids,
+            "ingredients": [{"id": ctx.ingredient_id, "amount": 5}],
+        }
+
+    def remember(response):
+        created["id"] = response.json()["id"]
+
+    routes += [
+        get("recipes list anonymous", "/api/recipes/", auth=False),
+        get("recipes list cursor", "/api/recipes/?cursor="),
+        get("recipe detail", recipe),
+        get("recipe detail anonymous", recipe, auth=False),
+        get("tags list", "/api/tags/"),
+        get("ingredients list", "/api/ingredients/"),
+        get("ingredients search", f"/api/ingredients/?name={PREFIX}%20ин"),
+        get("ingredient detail", f"/api/ingredients/{ctx.ingredient_id}/"),
+        get("users list", "/api/users/"),
+        get("users me", "/api/users/me/"),
+        get("user detail", f"/api/users/{ctx.author.id}/"),
+        get("subscriptions", "/api/users/subscriptions/"),
+        get(
+            "subscriptions recipes_limit",
+            "/api/users/subscriptions/?recipes_limit=3",
+        ),
+        get("shopping cart preview", "/api/recipes/shopping_cart_preview/"),
+        get(
+            "download shopping cart txt",
+            "/api/recipes/download_shopping_cart/",
+        ),
+        get(
+            "download shopping cart csv",
+            "/api/recipes/download_shopping_cart/?format=csv",
+        ),
+        (
+            "favorite",
+            [
+                ("POST", f"{other}favorite/", None),
+                ("DELETE", f"{other}favorite/", None),
+            ],
+            True,
+        ),
+        (
+            "shopping cart",
+            [
+                ("POST", f"{other}shopping_cart/", None),
+                ("DELETE", f"{other}shopping_cart/", None),
+            ],
+            True,
+        ),
+        (
+            "favorite bulk",
+            [
+                ("POST", "/api/recipes/favorite/", {"recipes": [
+                    ctx.other_recipe_id, ctx.recipe_id
+                ]}),
+                ("DELETE", "/api/recipes/favorite/", {"recipes": [
+                    ctx.other_recipe_id
+                ]}),
+            ],
+            True,
+        ),
+        (
+            "subscribe",
+            [
+                ("POST", f"/api/users/{ctx.unfollowed_id}/subscribe/", None),
+                (
+                    "DELETE",
+                    f"/api/users/{ctx.unfollowed_id}/subscribe/",
+                    None,
+                ),
+            ],
+            True,
+        ),
+        (
+            "recipe",
+            [
+                ("POST", "/api/recipes/", recipe_data, remember),
+                ("PATCH", lambda: f"/api/recipes/{created['id']}/", {
+                    "name": "Бенчмарк 2"
+                }),
+                ("DELETE", lambda: f"/api/recipes/{created['id']}/", None),
+            ],
+            True,
+        ),
+    ]
+    return routes
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    index = max(0, math.ceil(percent / 100 * len(values)) - 1)
+    return sorted(values)[index]
+
+
+def summarize(samples):
+    latencies = [sample["ms"] for sample in samples]
+    queries = [sample["queries"] for sample in samples]
+    statuses = Counter(sample["status"] for sample in samples)
+    total = sum(latencies) / 1000
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "max_ms": round(max(latencies), 3),
+        "throughput_rps": round(len(samples) / total, 1) if total else None,
+        "queries_min": min(queries),
+        "queries_max": max(queries),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "statuses": {str(code): count for code, count in statuses.items()},
+        "error_rate": round(
+            sum(count for code, count in statuses.items() if code >= 400)
+            / len(samples),
+            4,
+        ),
+    }
+
+
+class Runner:
+    def __init__(self, ctx, host):
+        self.ctx = ctx
+        self.clients = {
+            True: Client(
+                HTTP_HOST=host, HTTP_AUTHORIZATION=f"Token {ctx.token}"
+            ),
+            False: Client(HTTP_HOST=host),
+        }
+
+    def request(self, client, method, path, data):
+        if callable(path):
+            path = path()
+        if callable(data):
+            data = data()
+        log = QueryLog()
+        with ExitStack() as stack:
+            for db in connections.all():
+                stack.enter_context(db.execute_wrapper(log))
+            start = time.perf_counter()
+            if method == "GET":
+                response = client.get(path)
+            else:
+                response = client.generic(
+                    method,
+                    path,
+                    json.dumps(data) if data is not None else "",
+                    content_type="application/json",
+                )
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        return response, {
+            "ms": elapsed * 1000,
+            "queries": log.count,
+            "status": response.status_code,
+        }
+
+    def run(self, routes, iterations, warmup):
+        results = {}
+        for name, steps, auth in routes:
+            client = self.clients[auth]
+            samples = {index: [] for index in range(len(steps))}
+            for iteration in range(warmup + iterations):
+                for index, (method, path, data, *callback) in enumerate(
+                    steps
+                ):
+                    response, measured = self.request(
+                        client, method, path, data
+                    )
+                    if callback and response.status_code < 400:
+                        callback[0](response)
+                    if iteration >= warmup:
+                        samples[index].append(measured)
+            for index, (method, *_) in enumerate(steps):
+                key = name if len(steps) == 1 else f"{name} {method}"
+                results[key] = summarize(samples[index])
+        return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(volumes, options):
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "database": connection.vendor,
+        "volumes": volumes,
+        "iterations": options["iterations"],
+        "warmup": options["warmup"],
+        "seed": options["seed"],
+    }
+
+
+def compare(old, new):
+    rows = []
+    for name, stats in new["routes"].items():
+        before = old["routes"].get(name)
+        if before is None:
+            continue
+        rows.append(
+            (
+                name,
+                before["p50_ms"],
+                stats["p50_ms"],
+                before["p95_ms"],
+                stats["p95_ms"],
+                before["queries_mean"],
+                stats["queries_mean"],
+            )
+        )
+    return rows
+
+
+def change(before, after):
+    if not before:
+        return ""
+    return f"{(after - before) / before * 100:+.0f}%"
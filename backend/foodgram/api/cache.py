@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+STATS = ("hit", "miss", "bypass")
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def generation_key(name):
+    return f"generation:{name}"
+
+
+def stats_key(name, event):
+    return f"stats:{name}:{event}"
+
+
+def bump_generation(name):
+    cache = get_cache()
+    try:
+        cache.incr(generation_key(name))
+    except ValueError:
+        cache.add(generation_key(name), time.time_ns(), timeout=None)
+
+
+def get_generations(names):
+    cache = get_cache()
+    keys = [generation_key(name) for name in names]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def record(name, event):
+    cache = get_cache()
+    key = stats_key(name, event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_stats(name):
+    cache = get_cache()
+    values = cache.get_many([stats_key(name, event) for event in STATS])
+    return {event: values.get(stats_key(name, event), 0) for event in STATS}
+
+
+def reset_stats(name):
+    get_cache().delete_many([stats_key(name, event) for event in STATS])
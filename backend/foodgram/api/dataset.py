@@ -0,0 +1,368 @@
+import math
+import random
+from datetime import datetime, time, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from recipe.bulk import write_rows
+from recipe.counters import COUNTERS, recount
+from recipe.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+    search_vector,
+)
+from users.models import Follow, User
+
+from .ingredient_index import invalidate_index
+
+PREFIX = "gen"
+UNITS = ("г", "мл", "шт", "ст. л.", "ч. л.", "по вкусу")
+SCATTER_STEP = 2654435761
+
+
+def zipf_rank(rng, n, exponent):
+    u = rng.random()
+    if abs(exponent - 1) < 1e-9:
+        rank = (n + 1) ** u
+    else:
+        power = 1 - exponent
+        rank = (((n + 1) ** power - 1) * u + 1) ** (1 / power)
+    return min(n, int(rank))
+
+
+def scatter_step(n):
+    step = SCATTER_STEP
+    while math.gcd(step, n) != 1:
+        step += 2
+    return step
+
+
+def zipf_index(rng, n, exponent, step):
+    return (zipf_rank(rng, n, exponent) - 1) * step % n
+
+
+def zipf_sample(rng, n, exponent, step, size, exclude=None):
+    size = min(size, n - (exclude is not None))
+    chosen = set()
+    attempts = 0
+    while len(chosen) < size and attempts < size * 20:
+        index = zipf_index(rng, n, exponent, step)
+        if index != exclude:
+            chosen.add(index)
+        attempts += 1
+    return chosen
+
+
+def count(rng, mean, limit):
+    if mean <= 0:
+        return 0
+    return min(limit, int(rng.expovariate(1 / mean)))
+
+
+def chunk_rng(plan, kind, chunk):
+    return random.Random(f"{plan['seed']}:{kind}:{chunk}")
+
+
+def timestamp(rng, plan):
+    return plan["end"] - timedelta(seconds=rng.random() * plan["period"])
+
+
+def parse_range(value):
+    low, _, high = value.partition("-")
+    low = int(low)
+    high = int(high or low)
+    if not 0 < low <= high:
+        raise ValueError(value)
+    return low, high
+
+
+def last_id(model):
+    return (
+        model.objects.order_by("-id").values_list("id", flat=True).first()
+        or 0
+    )
+
+
+def make_plan(options, image):
+    end = datetime.combine(options["end_date"], time(), tzinfo=timezone.utc)
+    return {
+        "seed": options["seed"],
+        "users": options["users"],
+        "recipes": options["recipes"],
+        "users_start": last_id(User) + 1,
+        "recipes_start": last_id(Recipe) + 1,
+        "author_skew": options["author_skew"],
+        "follow_skew": options["follow_skew"],
+        "recipe_skew": options["recipe_skew"],
+        "ingredients_per_recipe": parse_range(
+            options["ingredients_per_recipe"]
+        ),
+        "tags_per_recipe": parse_range(options["tags_per_recipe"]),
+        "favorites_per_user": options["favorites_per_user"],
+        "carts_per_user": options["carts_per_user"],
+        "follows_per_user": options["follows_per_user"],
+        "chunk_size": options["chunk_size"],
+        "end": end,
+        "period": options["days"] * 86400,
+        "password": make_password(None),
+        "image": image,
+    }
+
+
+def create_reference_data(plan, tags, ingredients):
+    rng = random.Random(f"{plan['seed']}:reference")
+    existing = Tag.objects.filter(slug__startswith=f"{PREFIX}-")
+    Tag.objects.bulk_create(
+        [
+            Tag(name=f"{PREFIX} {i}", color=f"#A{i:05X}", slug=f"{PREFIX}-{i}")
+            for i in range(existing.count(), tags)
+        ]
+    )
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(
+                name=f"{PREFIX} ингредиент {i}",
+                measurement_unit=rng.choice(UNITS),
+            )
+            for i in range(ingredients)
+        ],
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    plan["tag_ids"] = list(
+        Tag.objects.order_by("id").values_list("id", flat=True)
+    )
+    plan["ingredient_ids"] = list(
+        Ingredient.objects.order_by("id").values_list("id", flat=True)
+    )
+    if not plan["tag_ids"] or not plan["ingredient_ids"]:
+        raise ValueError("Нужен хотя бы один тег и один ингредиент.")
+    transaction.on_commit(invalidate_index)
+
+
+def user_rows(plan, chunk, start, stop):
+    rng = chunk_rng(plan, "users", chunk)
+    for index in range(start, stop):
+        pk = plan["users_start"] + index
+        joined = timestamp(rng, plan)
+        yield (
+            pk,
+            plan["password"],
+            False,
+            f"{PREFIX}{pk}",
+            "Пользователь",
+            str(pk),
+            f"{PREFIX}{pk}@example.com",
+            False,
+            True,
+            joined,
+            0,
+            0,
+        )
+
+
+USER_FIELDS = (
+    "id",
+    "password",
+    "is_superuser",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "is_staff",
+    "is_active",
+    "date_joined",
+    "recipes_count",
+    "followers_count",
+)
+
+
+def recipe_rows(plan, chunk, start, stop):
+    rng = chunk_rng(plan, "recipes", chunk)
+    users = plan["users"]
+    step = scatter_step(users)
+    for index in range(start, stop):
+        pk = plan["recipes_start"] + index
+        author = plan["users_start"] + zipf_index(
+            rng, users, plan["author_skew"], step
+        )
+        published = timestamp(rng, plan)
+        yield (
+            pk,
+            author,
+            f"Рецепт {pk}",
+            plan["image"],
+            f"Описание рецепта {pk}.",
+            rng.randint(1, 180),
+            published,
+            published,
+            0,
+            0,
+        )
+
+
+RECIPE_FIELDS = (
+    "id",
+    "author",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+    "pub_date",
+    "updated_at",
+    "favorites_count",
+    "in_carts_count",
+)
+
+
+def recipe_tag_rows(plan, chunk, start, stop):
+    rng = chunk_rng(plan, "recipe_tags", chunk)
+    tag_ids = plan["tag_ids"]
+    low, high = plan["tags_per_recipe"]
+    for index in range(start, stop):
+        pk = plan["recipes_start"] + index
+        for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(
+            low, high
+        ))):
+            yield pk, tag_id
+
+
+def ingredient_rows(plan, chunk, start, stop):
+    rng = chunk_rng(plan, "ingredients", chunk)
+    ingredient_ids = plan["ingredient_ids"]
+    size = len(ingredient_ids)
+    step = scatter_step(size)
+    low, high = plan["ingredients_per_recipe"]
+    for index in range(start, stop):
+        pk = plan["recipes_start"] + index
+        for position in zipf_sample(
+            rng, size, 1.0, step, rng.randint(low, high)
+        ):
+            yield pk, ingredient_ids[position], rng.randint(1, 500)
+
+
+def relation_rows(kind, mean_key):
+    def rows(plan, chunk, start, stop):
+        rng = chunk_rng(plan, kind, chunk)
+        recipes = plan["recipes"]
+        step = scatter_step(recipes)
+        for index in range(start, stop):
+            user = plan["users_start"] + index
+            for position in zipf_sample(
+                rng,
+                recipes,
+                plan["recipe_skew"],
+                step,
+                count(rng, plan[mean_key], recipes),
+            ):
+                yield user, plan["recipes_start"] + position
+
+    return rows
+
+
+def follow_rows(plan, chunk, start, stop):
+    rng = chunk_rng(plan, "follows", chunk)
+    users = plan["users"]
+    step = scatter_step(users)
+    for index in range(start, stop):
+        follower = plan["users_start"] + index
+        for position in zipf_sample(
+            rng,
+            users,
+            plan["follow_skew"],
+            step,
+            count(rng, plan["follows_per_user"], users),
+            exclude=index,
+        ):
+            yield follower, plan["users_start"] + position
+
+
+def recipe_totals(plan, chunk, start, stop):
+    pks = range(plan["recipes_start"] + start, plan["recipes_start"] + stop)
+    if connection.vendor == "postgresql":
+        Recipe.objects.filter(pk__in=pks).update(
+            search_vector=search_vector()
+        )
+    for name, (model, *_) in COUNTERS.items():
+        if model is Recipe:
+            recount(name, pks)
+    return ()
+
+
+def user_totals(plan, chunk, start, stop):
+    pks = range(plan["users_start"] + start, plan["users_start"] + stop)
+    for name, (model, *_) in COUNTERS.items():
+        if model is User:
+            recount(name, pks)
+    ShoppingListItem.objects.rebuild(pks, batch_size=5000)
+    return ()
+
+
+TABLES = {
+    "users": (User, USER_FIELDS, user_rows, "users"),
+    "recipes": (Recipe, RECIPE_FIELDS, recipe_rows, "recipes"),
+    "recipe_tags": (
+        Recipe.tags.through,
+        ("recipe", "tag"),
+        recipe_tag_rows,
+        "recipes",
+    ),
+    "ingredients": (
+        IngredientInRecipe,
+        ("recipe", "ingredient", "amount"),
+        ingredient_rows,
+        "recipes",
+    ),
+    "favorites": (
+        Favorite,
+        ("user", "recipe"),
+        relation_rows("favorites", "favorites_per_user"),
+        "users",
+    ),
+    "carts": (
+        ShoppingCart,
+        ("user", "recipe"),
+        relation_rows("carts", "carts_per_user"),
+        "users",
+    ),
+    "follows": (Follow, ("author", "user"), follow_rows, "users"),
+    "recipe_totals": (None, (), recipe_totals, "recipes"),
+    "user_totals": (None, (), user_totals, "users"),
+}
+PHASES = (
+    ("users",),
+    ("recipes",),
+    ("recipe_tags", "ingredients", "favorites", "carts", "follows"),
+    ("recipe_totals", "user_totals"),
+)
+
+
+def tasks(plan, phase):
+    size = plan["chunk_size"]
+    for kind in phase:
+        total = plan[TABLES[kind][3]]
+        for chunk, start in enumerate(range(0, total, size)):
+            yield kind, chunk, start, min(total, start + size)
+
+
+def run_task(plan, task):
+    kind, chunk, start, stop = task
+    model, fields, generate, _ = TABLES[kind]
+    with transaction.atomic():
+        rows = list(generate(plan, chunk, start, stop))
+        if rows:
+            write_rows(model, fields, rows)
+    return kind, stop - start, len(rows)
+
+
+def reset_sequences():
+    statements = connection.ops.sequence_reset_sql(no_style(), [User, Recipe])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
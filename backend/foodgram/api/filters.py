@@ -1,6 +1,8 @@
-from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
 from django_filters import FilterSet, filters
-from recipe.models import Ingredient, Recipe
+from recipe.models import SEARCH_CONFIG, Ingredient, Recipe
 
 
 class IngredientFilter(FilterSet):
@@ -31,10 +33,17 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.NumberFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
-        fields = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "author",
+            "tags",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -45,3 +54,17 @@ class RecipeFilter(FilterSet):
         if value and not self.request.user.is_anonymous:
             return queryset.filter(shoppingcart__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        if connections[queryset.db].vendor != "postgresql":
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type="websearch"
+        )
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-pub_date")
+        )
@@ -0,0 +1,254 @@
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from django.conf import settings
+from recipe.models import Ingredient
+
+MAGIC = b"FGII"
+VERSION = 1
+MAX_GRAM = 3
+GRAM_BYTES = 12
+HEADER = struct.Struct("<4sIII")
+RECORD = struct.Struct("<QII")
+GRAM = struct.Struct(f"<{GRAM_BYTES}sII")
+POSTING = struct.Struct("<I")
+
+_lock = threading.Lock()
+_index = None
+
+
+def normalize(value):
+    return value.strip().lower()
+
+
+def grams(key, size):
+    return {key[i:i + size] for i in range(len(key) - size + 1)}
+
+
+def write_index(path, ingredients):
+    records = sorted(
+        (normalize(name).encode(), pk, name, measurement_unit)
+        for pk, name, measurement_unit in ingredients
+    )
+    postings = {}
+    for position, (key, *_) in enumerate(records):
+        key = key.decode()
+        for size in range(1, MAX_GRAM + 1):
+            for gram in grams(key, size):
+                postings.setdefault(gram.encode(), []).append(position)
+
+    strings = bytearray()
+    record_table = bytearray()
+    for key, pk, name, measurement_unit in records:
+        blob = b"\0".join((key, name.encode(), measurement_unit.encode()))
+        record_table += RECORD.pack(pk, len(strings), len(blob))
+        strings += blob
+
+    gram_table = bytearray()
+    posting_table = bytearray()
+    offset = 0
+    for gram in sorted(postings):
+        positions = postings[gram]
+        gram_table += GRAM.pack(gram, offset, len(positions))
+        for position in positions:
+            posting_table += POSTING.pack(position)
+        offset += len(positions)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), len(postings)))
+        f.write(record_table)
+        f.write(gram_table)
+        f.write(posting_table)
+        f.write(strings)
+    os.replace(tmp_path, path)
+
+
+def build_index(path=None):
+    path = path or settings.INGREDIENT_INDEX_PATH
+    write_index(
+        path,
+        Ingredient.objects.values_list("id", "name", "measurement_unit"),
+    )
+    return path
+
+
+def invalidate_index(path=None):
+    try:
+        os.remove(path or settings.INGREDIENT_INDEX_PATH)
+    except FileNotFoundError:
+        pass
+
+
+class IngredientIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.gram_count = HEADER.unpack_from(
+            self.data
+        )
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Неизвестный формат индекса: {path}")
+        self.records_start = HEADER.size
+        self.grams_start = self.records_start + RECORD.size * self.size
+        self.postings_start = self.grams_start + GRAM.size * self.gram_count
+        posting_count = 0
+        if self.gram_count:
+            _, offset, count = self._gram(self.gram_count - 1)
+            posting_count = offset + count
+        self.strings_start = (
+            self.postings_start + POSTING.size * posting_count
+        )
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def stamp(self):
+        stat = self.stat
+        return f"{stat.st_ino}.{stat.st_mtime_ns}.{stat.st_size}"
+
+    @property
+    def modified(self):
+        return datetime.fromtimestamp(self.stat.st_mtime, tz=timezone.utc)
+
+    def is_stale(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) != (
+            self.stat.st_ino,
+            self.stat.st_mtime_ns,
+            self.stat.st_size,
+        )
+
+    def close(self):
+        self.data.close()
+
+    def _blob(self, position):
+        _, offset, length = RECORD.unpack_from(
+            self.data, self.records_start + RECORD.size * position
+        )
+        start = self.strings_start + offset
+        return self.data[start:start + length]
+
+    def _key(self, position):
+        blob = self._blob(position)
+        return blob[:blob.index(b"\0")]
+
+    def _record(self, position):
+        pk, _, _ = RECORD.unpack_from(
+            self.data, self.records_start + RECORD.size * position
+        )
+        _, name, measurement_unit = self._blob(position).split(b"\0")
+        return {
+            "id": pk,
+            "name": name.decode(),
+            "measurement_unit": measurement_unit.decode(),
+        }
+
+    def _gram(self, position):
+        return GRAM.unpack_from(
+            self.data, self.grams_start + GRAM.size * position
+        )
+
+    def _postings(self, gram):
+        gram = gram.encode().ljust(GRAM_BYTES, b"\0")
+        lo, hi = 0, self.gram_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._gram(mid)[0] < gram:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.gram_count or self._gram(lo)[0] != gram:
+            return []
+        _, offset, count = self._gram(lo)
+        start = self.postings_start + POSTING.size * offset
+        return [
+            POSTING.unpack_from(self.data, start + POSTING.size * i)[0]
+            for i in range(count)
+        ]
+
+    def _prefix_range(self, key):
+        keys = _KeyView(self)
+        lo = bisect_left(keys, key)
+        hi = lo
+        while hi < self.size and self._key(hi).startswith(key):
+            hi += 1
+        return lo, hi
+
+    def search(self, value):
+        value = normalize(value)
+        if not value:
+            return [self._record(position) for position in range(self.size)]
+        key = value.encode()
+        lo, hi = self._prefix_range(key)
+        size = min(MAX_GRAM, len(value))
+        candidates = None
+        for gram in grams(value, size):
+            positions = set(self._postings(gram))
+            candidates = (
+                positions if candidates is None else candidates & positions
+            )
+            if not candidates:
+                break
+        contains = [
+            position
+            for position in sorted(candidates or ())
+            if not lo <= position < hi
+            and (len(value) <= MAX_GRAM or key in self._key(position))
+        ]
+        return [
+            self._record(position)
+            for position in [*range(lo, hi), *contains]
+        ]
+
+
+class _KeyView:
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, position):
+        return self.index._key(position)
+
+
+def get_index():
+    global _index
+    path = settings.INGREDIENT_INDEX_PATH
+    index = _index
+    if index is not None and index.path == path and not index.is_stale():
+        return index
+    with _lock:
+        previous = _index
+        if (
+            previous is not None
+            and previous.path == path
+            and not previous.is_stale()
+        ):
+            return previous
+        if not os.path.exists(path):
+            build_index(path)
+        _index = IngredientIndex(path)
+        if previous is not None:
+            previous.close()
+        return _index
+
+
+def search_ingredients(value):
+    try:
+        return get_index().search(value)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,76 @@
+from django.db.models import Manager
+from recipe.models import Favorite, ShoppingCart
+from rest_framework.serializers import ListSerializer
+from users.models import Follow
+
+RELATIONS = {
+    "followed": (Follow, "author", "user_id", "authors"),
+    "favorite": (Favorite, "user", "recipe_id", "recipes"),
+    "shopping_cart": (ShoppingCart, "user", "recipe_id", "recipes"),
+}
+
+
+class ViewerRelationsLoader:
+    def __init__(self, user):
+        self.user = user
+        self.pending = {"authors": set(), "recipes": set()}
+        self.checked = {name: set() for name in RELATIONS}
+        self.found = {name: set() for name in RELATIONS}
+
+    @property
+    def is_anonymous(self):
+        return self.user is None or self.user.is_anonymous
+
+    def add(self, authors=(), recipes=()):
+        self.pending["authors"].update(authors)
+        self.pending["recipes"].update(recipes)
+
+    def contains(self, name, pk):
+        if self.is_anonymous:
+            return False
+        checked = self.checked[name]
+        if pk not in checked:
+            model, user_field, id_field, kind = RELATIONS[name]
+            ids = (self.pending[kind] | {pk}) - checked
+            self.found[name].update(
+                model.objects.filter(
+                    **{user_field: self.user, f"{id_field}__in": ids}
+                ).values_list(id_field, flat=True)
+            )
+            checked.update(ids)
+        return pk in self.found[name]
+
+    def is_subscribed(self, author_id):
+        return self.contains("followed", author_id)
+
+    def is_favorited(self, recipe_id):
+        return self.contains("favorite", recipe_id)
+
+    def is_in_shopping_cart(self, recipe_id):
+        return self.contains("shopping_cart", recipe_id)
+
+
+def get_viewer_relations(context):
+    loader = context.get("viewer_relations")
+    if loader is not None:
+        return loader
+    request = context.get("request")
+    loader = getattr(request, "viewer_relations", None)
+    if loader is None:
+        loader = ViewerRelationsLoader(getattr(request, "user", None))
+        if request is not None:
+            request.viewer_relations = loader
+    context["viewer_relations"] = loader
+    return loader
+
+
+class ViewerRelationsListSerializer(ListSerializer):
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, Manager) else data)
+        get_viewer_relations(self.context).add(
+            **{
+                kind: [getattr(obj, attr) for obj in objects]
+                for kind, attr in self.child.viewer_relation_ids.items()
+            }
+        )
+        return super().to_representation(objects)
@@ -0,0 +1,455 @@
+import io
+import json
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import quote, unquote_to_bytes, urlsplit
+
+from django.db import connections
+from django.db.models import Q
+from recipe.models import Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from . import benchmark, dataset
+from .benchmark import percentile
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+DEFAULT_SCENARIO = {
+    "target": "wsgi",
+    "host": "localhost",
+    "users": 10,
+    "duration": 30,
+    "requests": None,
+    "think_time_ms": 0,
+    "seed": 42,
+    "mix": {
+        "browse": 50,
+        "favorite": 15,
+        "cart": 10,
+        "autocomplete": 25,
+    },
+    "replay": None,
+}
+
+
+def request(route, method, path, data=None):
+    return {"route": route, "method": method, "path": path, "data": data}
+
+
+def browse(ctx, rng):
+    recipe_id = rng.choice(ctx.recipe_ids)
+    page = rng.randint(1, 5)
+    return None, [
+        request("recipes list", "GET", f"/api/recipes/?page={page}"),
+        request("recipe detail", "GET", f"/api/recipes/{recipe_id}/"),
+        request("tags list", "GET", "/api/tags/"),
+    ]
+
+
+def favorite(ctx, rng):
+    path = f"/api/recipes/{rng.choice(ctx.recipe_ids)}/favorite/"
+    return rng.choice(ctx.user_ids), [
+        request("favorite add", "POST", path),
+        request("favorites list", "GET", "/api/recipes/?is_favorited=1"),
+        request("favorite remove", "DELETE", path),
+    ]
+
+
+def cart(ctx, rng):
+    size = min(len(ctx.recipe_ids), rng.randint(1, 5))
+    recipes = {"recipes": rng.sample(ctx.recipe_ids, size)}
+    return rng.choice(ctx.user_ids), [
+        request("cart add", "POST", "/api/recipes/shopping_cart/", recipes),
+        request(
+            "cart preview", "GET", "/api/recipes/shopping_cart_preview/"
+        ),
+        request(
+            "download shopping cart",
+            "GET",
+            "/api/recipes/download_shopping_cart/",
+        ),
+        request(
+            "cart remove", "DELETE", "/api/recipes/shopping_cart/", recipes
+        ),
+    ]
+
+
+def autocomplete(ctx, rng):
+    name = rng.choice(ctx.ingredient_names)
+    return rng.choice(ctx.user_ids), [
+        request(
+            "ingredients search",
+            "GET",
+            f"/api/ingredients/?name={quote(name[:length])}",
+        )
+        for length in range(1, min(len(name), 4) + 1)
+    ]
+
+
+BEHAVIOURS = {
+    "browse": browse,
+    "favorite": favorite,
+    "cart": cart,
+    "autocomplete": autocomplete,
+}
+
+
+def synthetic_users():
+    return User.objects.filter(
+        Q(username__startswith=f"{benchmark.PREFIX}_")
+        | Q(username__regex=rf"^{dataset.PREFIX}[0-9]+$"),
+        email__endswith="@example.com",
+        is_active=True,
+        is_staff=False,
+        is_superuser=False,
+    )
+
+
+def check_synthetic(user_ids):
+    user_ids = set(user_ids) - {None}
+    unknown = user_ids - set(
+        synthetic_users()
+        .filter(pk__in=user_ids)
+        .values_list("pk", flat=True)
+    )
+    if unknown:
+        raise ValueError(
+            "Нагрузка выполняется только от синтетических пользователей "
+            "generate_dataset и benchmark; другие id: "
+            f"{sorted(unknown)[:10]}"
+        )
+    return user_ids
+
+
+class Context:
+    def __init__(self, accounts, sample_size=2000):
+        self.user_ids = list(
+            synthetic_users()
+            .order_by("-id")
+            .values_list("id", flat=True)[:accounts]
+        )
+        self.recipe_ids = list(
+            Recipe.objects.order_by("-id").values_list("id", flat=True)[
+                :sample_size
+            ]
+        )
+        self.ingredient_names = list(
+            Ingredient.objects.order_by("id").values_list("name", flat=True)[
+                :sample_size
+            ]
+        )
+        if not (self.user_ids and self.recipe_ids and self.ingredient_names):
+            raise ValueError(
+                "Нужны синтетические пользователи, рецепты и ингредиенты; "
+                "заполните базу командой generate_dataset или benchmark."
+            )
+
+
+def load_scenario(path=None, **overrides):
+    scenario = dict(DEFAULT_SCENARIO)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            scenario.update(json.load(f))
+    scenario.update(
+        {key: value for key, value in overrides.items() if value is not None}
+    )
+    unknown = set(scenario["mix"]) - set(BEHAVIOURS)
+    if unknown:
+        raise ValueError(f"Неизвестные сценарии: {sorted(unknown)}")
+    return scenario
+
+
+def generate_sessions(scenario, ctx, rng):
+    names = list(scenario["mix"])
+    weights = [scenario["mix"][name] for name in names]
+    while True:
+        yield BEHAVIOURS[rng.choices(names, weights)[0]](ctx, rng)
+
+
+def write_log(path, sessions, limit):
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for number, (user_id, requests) in enumerate(sessions):
+            for item in requests:
+                line = {"session": number, "user": user_id, **item}
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                written += 1
+            if written >= limit:
+                return written
+    return written
+
+
+def read_log(path):
+    sessions = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = item.get("session", f"line-{number}")
+            user_id, requests = sessions.setdefault(
+                key, (item.get("user"), [])
+            )
+            requests.append(
+                request(
+                    item.get("route") or item["path"].partition("?")[0],
+                    item.get("method", "GET").upper(),
+                    item["path"],
+                    item.get("data"),
+                )
+            )
+    return list(sessions.values())
+
+
+def get_tokens(user_ids):
+    user_ids = check_synthetic(user_ids)
+    tokens = dict(
+        Token.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", "key"
+        )
+    )
+    missing = [
+        Token(user_id=user_id, key=Token.generate_key())
+        for user_id in user_ids - set(tokens)
+    ]
+    Token.objects.bulk_create(missing)
+    tokens.update((token.user_id, token.key) for token in missing)
+    return tokens
+
+
+class WSGITransport:
+    def __init__(self, host):
+        from foodgram.wsgi import application
+
+        self.application = application
+        self.host = host
+
+    def request(self, method, path, body, headers):
+        path, _, query = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": unquote_to_bytes(path).decode("iso-8859-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "HTTP_HOST": self.host,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        status = []
+
+        def start_response(line, response_headers, exc_info=None):
+            status.append(int(line.split()[0]))
+
+        result = self.application(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return status[0], size
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.connection_class = (
+            HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body, headers):
+        if self.connection is None:
+            self.connection = self.connection_class(
+                self.netloc, timeout=self.timeout
+            )
+        try:
+            self.connection.request(
+                method,
+                self.prefix + path,
+                body=body,
+                headers={"Content-Type": "application/json", **headers},
+            )
+            response = self.connection.getresponse()
+            return response.status, len(response.read())
+        except (OSError, HTTPException):
+            self.close()
+            raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def make_transport(scenario):
+    if scenario["target"] == "wsgi":
+        return WSGITransport(scenario["host"])
+    return HTTPTransport(scenario["target"])
+
+
+class LoadTest:
+    def __init__(self, scenario, tokens, sessions=None, ctx=None):
+        self.scenario = scenario
+        self.tokens = tokens
+        self.replay = iter(sessions) if sessions is not None else None
+        self.ctx = ctx
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.failures = Counter()
+        self.sent = 0
+        self.deadline = None
+
+    def next_session(self, sessions):
+        with self.lock:
+            return next(self.replay if sessions is None else sessions, None)
+
+    def reserve(self):
+        with self.lock:
+            limit = self.scenario["requests"]
+            if limit is not None and self.sent >= limit:
+                return False
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return False
+            self.sent += 1
+            return True
+
+    def record(self, route, elapsed, status, error=None):
+        with self.lock:
+            self.samples[route].append((elapsed * 1000, status))
+            if error is not None:
+                self.failures[f"{route}: {error!r}"] += 1
+
+    def virtual_user(self, number):
+        sessions = None
+        if self.replay is None:
+            rng = random.Random(f"{self.scenario['seed']}:{number}")
+            sessions = generate_sessions(self.scenario, self.ctx, rng)
+        transport = make_transport(self.scenario)
+        think_time = self.scenario["think_time_ms"] / 1000
+        try:
+            while True:
+                session = self.next_session(sessions)
+                if session is None:
+                    return
+                user_id, requests = session
+                headers = {}
+                if user_id is not None:
+                    headers["Authorization"] = f"Token {self.tokens[user_id]}"
+                for item in requests:
+                    if not self.reserve():
+                        return
+                    self.send(transport, item, headers)
+                    if think_time:
+                        time.sleep(think_time)
+        finally:
+            transport.close()
+
+    def send(self, transport, item, headers):
+        body = b""
+        if item["data"] is not None:
+            body = json.dumps(item["data"]).encode()
+        start = time.perf_counter()
+        try:
+            status, _ = transport.request(
+                item["method"], item["path"], body, headers
+            )
+        except Exception as error:
+            self.record(
+                item["route"], time.perf_counter() - start, None, error
+            )
+        else:
+            self.record(item["route"], time.perf_counter() - start, status)
+
+    def run(self):
+        duration = self.scenario["duration"]
+        started = time.monotonic()
+        self.deadline = started + duration if duration else None
+        threads = [
+            threading.Thread(target=self.virtual_user, args=(number,))
+            for number in range(self.scenario["users"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        routes = {
+            route: summarize(samples, elapsed)
+            for route, samples in sorted(self.samples.items())
+        }
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "total": summarize(
+                [
+                    sample
+                    for samples in self.samples.values()
+                    for sample in samples
+                ],
+                elapsed,
+            ),
+            "routes": routes,
+            "failures": dict(self.failures.most_common(20)),
+        }
+
+
+def histogram(latencies):
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for value in latencies:
+        counts[bisect_left(BUCKETS_MS, value)] += 1
+    labels = [f"<={bucket}" for bucket in BUCKETS_MS]
+    labels.append(f">{BUCKETS_MS[-1]}")
+    return dict(zip(labels, counts))
+
+
+def summarize(samples, elapsed):
+    if not samples:
+        return {"requests": 0}
+    latencies = [ms for ms, _ in samples]
+    statuses = Counter(
+        "error" if status is None else str(status) for _, status in samples
+    )
+    errors = sum(
+        count
+        for status, count in statuses.items()
+        if status == "error" or int(status) >= 500
+    )
+    client_errors = sum(
+        count
+        for status, count in statuses.items()
+        if status.startswith("4")
+    )
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+        "histogram_ms": histogram(latencies),
+        "statuses": dict(statuses),
+        "error_rate": round(errors / len(samples), 4),
+        "client_error_rate": round(client_errors / len(samples), 4),
+    }
@@ -0,0 +1,122 @@
+import json
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими данными и измеряет задержки, "
+        "пропускную способность и число запросов к БД для маршрутов API. "
+        "Пишет в базу из текущих настроек."
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.DEFAULT_VOLUMES.items():
+            parser.add_argument(
+                f"--{name.replace('_', '-')}", type=int, default=default
+            )
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--route",
+            action="append",
+            dest="routes",
+            help="Измерить только маршруты, в названии которых есть строка.",
+        )
+        parser.add_argument(
+            "--reseed",
+            action="store_true",
+            help="Удалить ранее созданные данные бенчмарка и создать заново.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Только удалить данные бенчмарка.",
+        )
+        parser.add_argument("--host", help="Значение заголовка Host.")
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument(
+            "--compare", help="JSON предыдущего запуска для сравнения."
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations должно быть не меньше 1.")
+        if options["clear"] or options["reseed"]:
+            benchmark.clear()
+            if options["clear"]:
+                self.stdout.write(self.style.SUCCESS("Данные удалены."))
+                return
+        rng = random.Random(options["seed"])
+        volumes = {
+            name: options[name] for name in benchmark.DEFAULT_VOLUMES
+        }
+        if benchmark.is_seeded():
+            self.stdout.write("Используются ранее созданные данные.")
+        else:
+            self.stdout.write(f"Создание данных: {volumes}")
+            benchmark.seed(volumes, rng)
+
+        ctx = benchmark.Context(rng)
+        routes = benchmark.build_routes(ctx)
+        if options["routes"]:
+            routes = [
+                route
+                for route in routes
+                if any(part in route[0] for part in options["routes"])
+            ]
+        if not routes:
+            raise CommandError("Нет маршрутов для измерения.")
+        host = options["host"] or next(
+            (
+                host.lstrip(".")
+                for host in settings.ALLOWED_HOSTS
+                if host and host != "*"
+            ),
+            "localhost",
+        )
+        runner = benchmark.Runner(ctx, host)
+        results = {
+            "meta": benchmark.metadata(volumes, options),
+            "routes": runner.run(
+                routes, options["iterations"], options["warmup"]
+            ),
+        }
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+        self.report(results["routes"])
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as f:
+                self.report_changes(benchmark.compare(json.load(f), results))
+        self.stdout.write(
+            self.style.SUCCESS(f"Результаты записаны в {options['output']}")
+        )
+
+    def report(self, routes):
+        width = max(map(len, routes))
+        self.stdout.write(
+            f"{'маршрут':<{width}}  {'p50':>8}  {'p95':>8}  "
+            f"{'rps':>7}  {'запросы':>7}  ошибки"
+        )
+        for name, stats in routes.items():
+            self.stdout.write(
+                f"{name:<{width}}  {stats['p50_ms']:>8.2f}  "
+                f"{stats['p95_ms']:>8.2f}  {stats['throughput_rps']:>7}  "
+                f"{stats['queries_mean']:>7}  {stats['error_rate']:.0%}"
+            )
+
+    def report_changes(self, rows):
+        self.stdout.write("\nСравнение с предыдущим запуском (p50, p95, SQL):")
+        for name, p50, new_p50, p95, new_p95, queries, new_queries in rows:
+            self.stdout.write(
+                f"{name}: {p50} → {new_p50} мс "
+                f"{benchmark.change(p50, new_p50)}, "
+                f"{p95} → {new_p95} мс {benchmark.change(p95, new_p95)}, "
+                f"{queries} → {new_queries}"
+            )
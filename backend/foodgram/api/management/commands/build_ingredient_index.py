@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.ingredient_index import IngredientIndex, build_index
+
+
+class Command(BaseCommand):
+    help = "Строит индекс автодополнения ингредиентов."
+
+    def handle(self, *args, **options):
+        path = build_index()
+        index = IngredientIndex(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Индекс {path} построен: {len(index)} ингредиентов."
+            )
+        )
+        index.close()
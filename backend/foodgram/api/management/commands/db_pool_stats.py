@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.db.pool import collect_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает метрики пулов соединений с БД по процессам: "
+        "загрузку, ожидание выдачи соединения и пересоздание соединений. "
+        "Процессы пишут метрики в каталог DB_POOL_STATS_DIR: чтобы видеть "
+        "все воркеры, каталог должен быть общим для них (общий том, если "
+        "воркеры в разных контейнерах)."
+    )
+
+    def handle(self, *args, **options):
+        pools = collect_stats()
+        if not pools:
+            self.stdout.write("Нет данных: пул не используется.")
+            return
+        for stats in sorted(
+            pools, key=lambda stats: (stats["host"], stats["pid"])
+        ):
+            checkouts = stats["checkouts"]
+            closed = sum(stats["closed"].values())
+            self.stdout.write(
+                f"{stats['alias']} {stats['host']}:{stats['pid']} "
+                f"занято {stats['in_use']}/{stats['max_size']} "
+                f"({stats['saturation']:.0%}, пик {stats['peak_in_use']}), "
+                f"свободно {stats['idle']}; выдач {checkouts}, "
+                f"с ожиданием {stats['waits']} "
+                f"({stats['wait_ms']} мс), "
+                f"выдача в среднем "
+                f"{stats['checkout_ms'] / checkouts if checkouts else 0:.2f} "
+                f"мс, максимум {stats['checkout_ms_max']} мс, "
+                f"таймаутов {stats['timeouts']}; "
+                f"открыто {stats['created']}, закрыто {closed} "
+                f"{stats['closed']}"
+            )
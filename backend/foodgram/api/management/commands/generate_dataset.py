@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import time
+from datetime import date
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from recipe.images import ensure_image
+
+from api import dataset
+from api.signals import VERSIONED_MODELS, collection_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует воспроизводимый набор данных промышленного масштаба: "
+        "пользователей, рецепты, ингредиенты рецептов, избранное, корзины "
+        "и подписки с распределением популярности по закону Ципфа."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100000)
+        parser.add_argument("--recipes", type=int, default=1000000)
+        parser.add_argument("--tags", type=int, default=12)
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            default=0,
+            help="Сколько ингредиентов создать в дополнение к имеющимся.",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            default="3-12",
+            help="Диапазон числа ингредиентов в рецепте, например 3-12.",
+        )
+        parser.add_argument("--tags-per-recipe", default="1-3")
+        parser.add_argument("--favorites-per-user", type=float, default=30)
+        parser.add_argument("--carts-per-user", type=float, default=5)
+        parser.add_argument("--follows-per-user", type=float, default=20)
+        parser.add_argument(
+            "--author-skew",
+            type=float,
+            default=1.1,
+            help="Показатель Ципфа для числа рецептов у авторов.",
+        )
+        parser.add_argument(
+            "--recipe-skew",
+            type=float,
+            default=1.0,
+            help="Показатель Ципфа для популярности рецептов.",
+        )
+        parser.add_argument(
+            "--follow-skew",
+            type=float,
+            default=1.2,
+            help="Показатель Ципфа для числа подписчиков.",
+        )
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            default=date(2024, 1, 1),
+            help="Дата самой поздней публикации, YYYY-MM-DD.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help=(
+                "Строк-источников на задачу; от него, а не от числа "
+                "процессов зависит результат генерации."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help=(
+                "Число процессов; по умолчанию число CPU для PostgreSQL "
+                "и 1 для остальных СУБД."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        if options["users"] < 2 or options["recipes"] < 1:
+            raise CommandError("Нужно минимум 2 пользователя и 1 рецепт.")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size должен быть положительным.")
+        workers = options["workers"] or (
+            os.cpu_count() if connection.vendor == "postgresql" else 1
+        )
+        try:
+            plan = dataset.make_plan(options, ensure_image())
+        except ValueError as error:
+            raise CommandError(f"Некорректный диапазон: {error}")
+        try:
+            dataset.create_reference_data(
+                plan, options["tags"], options["ingredients"]
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(
+            f"Пользователи с id {plan['users_start']}, рецепты с id "
+            f"{plan['recipes_start']}; процессов: {workers}."
+        )
+        for phase in dataset.PHASES:
+            self.run_phase(plan, phase, workers)
+        dataset.reset_sequences()
+        for name in set(VERSIONED_MODELS.values()):
+            collection_changed(name)
+        self.stdout.write(self.style.SUCCESS("Готово."))
+
+    def run_phase(self, plan, phase, workers):
+        started = time.perf_counter()
+        tasks = list(dataset.tasks(plan, phase))
+        run = partial(dataset.run_task, plan)
+        if workers > 1:
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            with context.Pool(workers) as pool:
+                self.collect(pool.imap_unordered(run, tasks), len(tasks))
+        else:
+            self.collect(map(run, tasks), len(tasks))
+        self.stdout.write(
+            f"{', '.join(phase)}: {time.perf_counter() - started:.1f} с"
+        )
+
+    def collect(self, results, total):
+        rows = {}
+        for done, (kind, _, written) in enumerate(results, 1):
+            rows[kind] = rows.get(kind, 0) + written
+            if self.verbosity > 1:
+                self.stdout.write(f"  задач {done}/{total}")
+        for kind, written in rows.items():
+            if written:
+                self.stdout.write(f"  {kind}: {written} строк")
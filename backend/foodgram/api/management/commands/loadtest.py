@@ -0,0 +1,138 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает API виртуальными пользователями: напрямую через "
+        "foodgram.wsgi.application или по HTTP, если в сценарии указан URL "
+        "(например, локального gunicorn). Запросы с авторизацией идут "
+        "только от синтетических пользователей generate_dataset и "
+        "benchmark. Выполняет смесь сценариев "
+        f"{', '.join(loadtest.BEHAVIOURS)} или воспроизводит журнал "
+        "запросов JSONL и выводит пропускную способность, гистограмму "
+        "задержек и долю ошибок по маршрутам."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            help=(
+                "JSON-файл сценария; ключи: "
+                f"{', '.join(loadtest.DEFAULT_SCENARIO)}."
+            ),
+        )
+        parser.add_argument(
+            "--target", help="wsgi или базовый URL, например http://web:8000"
+        )
+        parser.add_argument("--host", help="Значение заголовка Host.")
+        parser.add_argument(
+            "--users", type=int, help="Виртуальных пользователей."
+        )
+        parser.add_argument("--duration", type=float, help="Секунд.")
+        parser.add_argument(
+            "--requests", type=int, help="Ограничить общее число запросов."
+        )
+        parser.add_argument("--seed", type=int)
+        parser.add_argument(
+            "--replay", help="Воспроизвести журнал запросов JSONL."
+        )
+        parser.add_argument(
+            "--record",
+            help=(
+                "Не нагружать, а записать сгенерированную смесь запросов "
+                "в журнал JSONL (не больше --requests строк, по умолчанию "
+                "1000)."
+            ),
+        )
+        parser.add_argument("--output", default="loadtest.json")
+
+    def handle(self, *args, **options):
+        try:
+            scenario = loadtest.load_scenario(
+                options["scenario"],
+                **{
+                    key: options[key]
+                    for key in (
+                        "target",
+                        "host",
+                        "users",
+                        "duration",
+                        "requests",
+                        "seed",
+                        "replay",
+                    )
+                },
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+        if scenario["users"] < 1:
+            raise CommandError("Нужен хотя бы один виртуальный пользователь.")
+
+        sessions = ctx = None
+        try:
+            if scenario["replay"]:
+                sessions = loadtest.read_log(scenario["replay"])
+                user_ids = loadtest.check_synthetic(
+                    user_id for user_id, _ in sessions
+                )
+            else:
+                ctx = loadtest.Context(max(scenario["users"], 10))
+                user_ids = ctx.user_ids
+        except ValueError as error:
+            raise CommandError(str(error))
+        if options["record"]:
+            if ctx is None:
+                raise CommandError("--record несовместим с --replay.")
+            written = loadtest.write_log(
+                options["record"],
+                loadtest.generate_sessions(
+                    scenario, ctx, random.Random(scenario["seed"])
+                ),
+                scenario["requests"] or 1000,
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Записано запросов: {written} в {options['record']}"
+                )
+            )
+            return
+
+        self.stdout.write(
+            f"Цель: {scenario['target']}, пользователей: "
+            f"{scenario['users']}, длительность: {scenario['duration']} с."
+        )
+        results = loadtest.LoadTest(
+            scenario, loadtest.get_tokens(user_ids), sessions, ctx
+        ).run()
+        results["scenario"] = scenario
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        self.report(results)
+        self.stdout.write(
+            self.style.SUCCESS(f"Результаты записаны в {options['output']}")
+        )
+
+    def report(self, results):
+        routes = {**results["routes"], "всего": results["total"]}
+        width = max(map(len, routes))
+        self.stdout.write(
+            f"{'маршрут':<{width}}  {'запросы':>7}  {'rps':>7}  "
+            f"{'p50':>8}  {'p95':>8}  {'p99':>8}  ошибки  4xx"
+        )
+        for name, stats in routes.items():
+            if not stats["requests"]:
+                continue
+            self.stdout.write(
+                f"{name:<{width}}  {stats['requests']:>7}  "
+                f"{stats['throughput_rps']:>7}  {stats['p50_ms']:>8.2f}  "
+                f"{stats['p95_ms']:>8.2f}  {stats['p99_ms']:>8.2f}  "
+                f"{stats['error_rate']:>6.1%}  "
+                f"{stats['client_error_rate']:.1%}"
+            )
+        for failure, count in results["failures"].items():
+            self.stderr.write(f"{count} × {failure}")
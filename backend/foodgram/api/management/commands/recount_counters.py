@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipe.counters import (
+    COUNTERS,
+    find_drift,
+    iter_pk_batches,
+    recount,
+)
+
+
+class Command(BaseCommand):
+    help = "Проверяет и исправляет денормализованные счетчики."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--counter",
+            action="append",
+            choices=list(COUNTERS),
+            dest="counters",
+            help="Обработать только указанный счетчик.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Только найти расхождения, ничего не меняя.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for name in options["counters"] or COUNTERS:
+            model = COUNTERS[name][0]
+            for pks in iter_pk_batches(model, options["batch_size"]):
+                with transaction.atomic():
+                    drift = find_drift(name, pks)
+                    if drift and not options["verify"]:
+                        recount(name, [pk for pk, _, _ in drift])
+                for pk, stored, expected in drift:
+                    self.stdout.write(
+                        f"{name} pk={pk}: сохранено {stored}, "
+                        f"ожидается {expected}"
+                    )
+                drifted += len(drift)
+        if options["verify"] and drifted:
+            raise CommandError(f"Расхождений: {drifted}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Исправлено расхождений: {drifted}.")
+            if drifted
+            else self.style.SUCCESS("Расхождений нет.")
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from api.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Показывает статистику кэша ответов API."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", default=["recipes"])
+        parser.add_argument(
+            "--reset", action="store_true", help="Обнулить счетчики."
+        )
+
+    def handle(self, *args, **options):
+        for name in options["names"]:
+            stats = get_stats(name)
+            lookups = stats["hit"] + stats["miss"]
+            ratio = stats["hit"] / lookups if lookups else 0
+            self.stdout.write(
+                f"{name}: hit={stats['hit']} miss={stats['miss']} "
+                f"bypass={stats['bypass']} hit_ratio={ratio:.2%}"
+            )
+            if options["reset"]:
+                reset_stats(name)
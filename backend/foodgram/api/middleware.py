@@ -0,0 +1,212 @@
+import heapq
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS = re.compile(r"%s(?:\s*,\s*%s)+")
+LITERALS = re.compile(r"\b\d+\b|'(?:[^']|'')*'")
+
+
+def is_select(sql):
+    return sql.lstrip()[:6].upper() == "SELECT"
+
+
+def query_shape(sql):
+    return LITERALS.sub("?", PLACEHOLDERS.sub("%s...", sql))
+
+
+class QueryLog:
+    def __init__(self, keep=0):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add(
+                time.perf_counter() - start,
+                context["connection"].alias,
+                sql,
+                params,
+            )
+
+    def add(self, duration, alias, sql, params):
+        self.count += 1
+        self.duration += duration
+        if is_select(sql):
+            self.shapes[query_shape(sql)] += 1
+        if self.keep:
+            query = (duration, self.count, alias, sql, params)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, query)
+            else:
+                heapq.heappushpop(self.slowest, query)
+
+    def worst(self, limit):
+        return [
+            (duration, alias, sql, params)
+            for duration, _, alias, sql, params in sorted(
+                self.slowest, reverse=True
+            )[:limit]
+        ]
+
+    def repeated(self, threshold):
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+current_log = ContextVar("query_log", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    log = current_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    return log(execute, sql, params, many, context)
+
+
+def install_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def connection_opened(sender, connection, **kwargs):
+    install_wrapper(connection)
+
+
+@contextmanager
+def instrument(log):
+    for connection in connections.all():
+        install_wrapper(connection)
+    token = current_log.set(log)
+    try:
+        yield
+    finally:
+        current_log.reset(token)
+
+
+def explain(alias, sql, params):
+    if not is_select(sql):
+        return None
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{connection.ops.explain_query_prefix()} {sql}", params
+            )
+            return "\n".join(
+                " ".join(map(str, row)) for row in cursor.fetchall()
+            )
+    except Exception as error:
+        return f"EXPLAIN не выполнен: {error}"
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        connection_created.connect(connection_opened)
+        self.get_response = get_response
+        self.slow_ms = settings.SLOW_REQUEST_MS
+        self.worst_count = settings.SLOW_REQUEST_QUERIES
+        self.explain = settings.SLOW_REQUEST_EXPLAIN
+        self.repeated_threshold = settings.REPEATED_QUERY_THRESHOLD
+        self.server_timing = settings.SERVER_TIMING_HEADER
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        log = request.query_log = QueryLog(self.worst_count)
+        start = time.perf_counter()
+        with instrument(log):
+            response = self.get_response(request)
+        return self.finish(request, response, log, start)
+
+    async def __acall__(self, request):
+        log = request.query_log = QueryLog(self.worst_count)
+        start = time.perf_counter()
+        with instrument(log):
+            response = await self.get_response(request)
+        if self.explain:
+            return await sync_to_async(self.finish)(
+                request, response, log, start
+            )
+        return self.finish(request, response, log, start)
+
+    def finish(self, request, response, log, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = log.duration * 1000
+        app_ms = total_ms - db_ms
+
+        if self.send_server_timing(request):
+            response["Server-Timing"] = ", ".join(
+                (
+                    f'db;dur={db_ms:.1f};desc="{log.count} queries"',
+                    f"app;dur={app_ms:.1f}",
+                    f"total;dur={total_ms:.1f}",
+                )
+            )
+        summary = (
+            f"{request.method} {request.get_full_path()} "
+            f"{response.status_code}: {total_ms:.1f} мс, "
+            f"БД {db_ms:.1f} мс ({log.count} запросов), "
+            f"Python {app_ms:.1f} мс"
+        )
+        if total_ms >= self.slow_ms:
+            self.log_slow(summary, log)
+        repeated = log.repeated(self.repeated_threshold)
+        if repeated:
+            logger.warning(
+                "Повторяющиеся запросы, возможен N+1: %s\n%s",
+                summary,
+                "\n".join(
+                    f"  {count}x {shape}" for shape, count in repeated
+                ),
+            )
+        return response
+
+    def send_server_timing(self, request):
+        if not self.server_timing:
+            return False
+        user = getattr(request, "user", None)
+        return settings.DEBUG or getattr(user, "is_staff", False)
+
+    def log_slow(self, summary, log):
+        lines = [f"Медленный запрос: {summary}"]
+        for duration, alias, sql, params in log.worst(self.worst_count):
+            lines.append(f"  {duration * 1000:.1f} мс [{alias}] {sql}")
+            if self.explain:
+                plan = explain(alias, sql, params)
+                if plan:
+                    lines.extend(
+                        f"    {line}" for line in plan.splitlines()
+                    )
+        logger.warning("\n".join(lines))
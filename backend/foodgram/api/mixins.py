@@ -0,0 +1,157 @@
+from hashlib import md5
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.settings import api_settings
+
+from .cache import get_cache, get_generations, record
+from .models import CollectionVersion
+
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Vary")
+
+
+class ConditionalGetMixin:
+    versioned_collections = ()
+    viewer_collections = ()
+
+    def get_versioned_collections(self, request):
+        if request.user.is_authenticated:
+            return (*self.versioned_collections, *self.viewer_collections)
+        return self.versioned_collections
+
+    def get_object_modified(self):
+        return None
+
+    def get_version_stamps(self, request):
+        names = self.get_versioned_collections(request)
+        versions = CollectionVersion.objects.get_versions(names)
+        stamps = [
+            f"{name}.{version}"
+            for name, (version, _) in zip(names, versions)
+        ]
+        modified = [updated_at for _, updated_at in versions if updated_at]
+        object_modified = self.get_object_modified()
+        if object_modified is not None:
+            stamps.append(object_modified.isoformat())
+            modified.append(object_modified)
+        return stamps, modified
+
+    def get_validators(self, request):
+        stamps, modified = self.get_version_stamps(request)
+        parts = [
+            self.basename,
+            self.action,
+            request.accepted_renderer.format,
+            request.get_full_path(),
+            str(request.user.pk),
+            *stamps,
+        ]
+        etag = quote_etag(md5(":".join(parts).encode()).hexdigest())
+        last_modified = int(max(modified).timestamp()) if modified else None
+        return etag, last_modified
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class CachedListMixin:
+    cache_collections = ()
+    cache_timeout = 300
+
+    def get_cache_params(self):
+        paginator = self.paginator
+        return {
+            *self.filterset_class.base_filters,
+            paginator.page_query_param,
+            paginator.page_size_query_param,
+            getattr(paginator, "cursor_query_param", None),
+            api_settings.URL_FORMAT_OVERRIDE,
+        }
+
+    def get_cache_key(self, request):
+        params = request.query_params
+        if not set(params) <= self.get_cache_params():
+            return None
+        normalized = sorted(
+            (param, sorted(set(params.getlist(param)))) for param in params
+        )
+        parts = [
+            request.scheme,
+            request.get_host(),
+            request.accepted_renderer.format,
+            repr(normalized),
+            *map(str, get_generations(self.cache_collections)),
+        ]
+        digest = md5(":".join(parts).encode()).hexdigest()
+        return f"response:{self.basename}:{digest}"
+
+    def cached_response(self, request, cached):
+        content, headers = cached
+        response = get_conditional_response(
+            request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(
+                headers.get("Last-Modified", "")
+            ),
+        )
+        if response is None:
+            response = HttpResponse(content)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        if key is None:
+            record(self.basename, "bypass")
+            response = super().list(request, *args, **kwargs)
+            response["X-Cache"] = "BYPASS"
+            return response
+        cache = get_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            record(self.basename, "hit")
+            response = self.cached_response(request, cached)
+            response["X-Cache"] = "HIT"
+            return response
+        record(self.basename, "miss")
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(
+            response, "add_post_render_callback"
+        ):
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key,
+                    (
+                        rendered.content,
+                        {
+                            header: rendered[header]
+                            for header in CACHED_HEADERS
+                            if rendered.has_header(header)
+                        },
+                    ),
+                    self.cache_timeout,
+                )
+            )
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,46 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+class CollectionVersionManager(models.Manager):
+    def bump(self, name):
+        now = timezone.now()
+        updated = self.filter(name=name).update(
+            version=F("version") + 1, updated_at=now
+        )
+        if not updated:
+            self.bulk_create(
+                [self.model(name=name, version=1, updated_at=now)],
+                ignore_conflicts=True,
+            )
+
+    def get_versions(self, names):
+        versions = {
+            name: (version, updated_at)
+            for name, version, updated_at in self.filter(
+                name__in=names
+            ).values_list("name", "version", "updated_at")
+        }
+        return [versions.get(name, (0, None)) for name in names]
+
+
+class CollectionVersion(models.Model):
+    name = models.CharField(
+        verbose_name="Коллекция", max_length=32, primary_key=True
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name="Версия", default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", default=timezone.now
+    )
+
+    objects = CollectionVersionManager()
+
+    class Meta:
+        verbose_name = "Версия коллекции"
+        verbose_name_plural = "Версии коллекций"
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
@@ -1,5 +1,259 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import md5
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from foodgram.paginator import estimate_count
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import get_cache, get_generations
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = "Неверный курсор."
+
+    def __init__(self, ordering=("-pub_date", "-id")):
+        self.ordering = ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj, direction):
+        values = [
+            self.fields[name].value_to_string(obj) for name in self.names
+        ]
+        cursor = json.dumps({direction: values})
+        return urlsafe_b64encode(cursor.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            cursor = json.loads(urlsafe_b64decode(cursor.encode()))
+            [(direction, values)] = cursor.items()
+            if direction not in ("after", "before"):
+                raise ValueError
+            if len(values) != len(self.names):
+                raise ValueError
+            return direction, [
+                self.fields[name].to_python(value)
+                for name, value in zip(self.names, values)
+            ]
+        except (
+            AttributeError,
+            BinasciiError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, values, reverse=False):
+        condition = Q()
+        for position, (field, value) in enumerate(zip(self.ordering, values)):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            step = Q(**{f"{name}__{lookup}": value})
+            for previous, previous_value in zip(
+                self.names[:position], values
+            ):
+                step &= Q(**{previous: previous_value})
+            condition |= step
+        return condition
+
+    def get_reverse_ordering(self):
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.names = [field.lstrip("-") for field in self.ordering]
+        self.fields = {
+            name: queryset.model._meta.get_field(name) for name in self.names
+        }
+        page_size = self.get_page_size(request)
+        direction, values = "after", None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == "before"
+        if reverse:
+            queryset = queryset.order_by(*self.get_reverse_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+        page = list(queryset[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.first = page[0] if page else None
+        self.last = page[-1] if page else None
+        return page
+
+    def get_link(self, obj, direction):
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(obj, direction),
+        )
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.get_link(self.last, "after")
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.get_link(self.first, "before")
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+
+class EstimatedPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CountingPaginator(DjangoPaginator):
+    def __init__(
+        self,
+        object_list,
+        per_page,
+        collections=(),
+        cache_timeout=30,
+        estimate_threshold=10000,
+    ):
+        super().__init__(object_list, per_page)
+        self.collections = collections
+        self.cache_timeout = cache_timeout
+        self.estimate_threshold = estimate_threshold
+
+    def get_count_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        parts = [
+            self.object_list.db,
+            sql,
+            repr(params),
+            *map(str, get_generations(self.collections)),
+        ]
+        return f"count:{md5(':'.join(parts).encode()).hexdigest()}"
+
+    @cached_property
+    def count_info(self):
+        cache = get_cache()
+        key = self.get_count_key()
+        count_info = cache.get(key)
+        if count_info is None:
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                count_info = (estimate, True)
+            else:
+                count_info = (self.object_list.count(), False)
+            cache.set(key, count_info, self.cache_timeout)
+        return count_info
+
+    @property
+    def count(self):
+        return self.count_info[0]
+
+    @property
+    def estimated(self):
+        return self.count_info[1]
+
+    def validate_number(self, number):
+        if not self.estimated:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Номер страницы должен быть числом.")
+        if number < 1:
+            raise EmptyPage("Номер страницы меньше 1.")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return EstimatedPage(
+            items[:self.per_page],
+            number,
+            self,
+            len(items) > self.per_page,
+        )
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
+    cursor_query_param = KeysetPagination.cursor_query_param
+    count_cache_timeout = 30
+    count_estimate_threshold = 10000
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountingPaginator(
+            queryset,
+            page_size,
+            collections=self.count_collections,
+            cache_timeout=self.count_cache_timeout,
+            estimate_threshold=self.count_estimate_threshold,
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        ordering = getattr(view, "keyset_ordering", ("-pub_date", "-id"))
+        explicit_ordering = tuple(queryset.query.order_by)
+        if self.cursor_query_param in request.query_params and (
+            not explicit_ordering or explicit_ordering == tuple(ordering)
+        ):
+            self.keyset = KeysetPagination(ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.count_collections = (
+            *getattr(view, "versioned_collections", ()),
+            *getattr(view, "viewer_collections", ()),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        response.data["count_estimated"] = self.page.paginator.estimated
+        return response
@@ -2,11 +2,17 @@ import base64
 
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db.models import (
+    BigIntegerField,
+    Prefetch,
+    prefetch_related_objects,
+)
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 from rest_framework.validators import UniqueValidator, UniqueTogetherValidator
+from recipe.counters import change_counter
+from recipe.images import get_variant_url, get_variant_urls
 from recipe.models import (
     IngredientInRecipe,
     Ingredient,
@@ -14,10 +20,13 @@ from recipe.models import (
     Tag,
     Favorite,
     ShoppingCart,
+    ShoppingListItem,
 )
 from users.models import User, Follow
 from rest_framework.serializers import ModelSerializer
 
+from .loaders import ViewerRelationsListSerializer, get_viewer_relations
+
 
 class ImageFieldSerializer(serializers.ImageField):
     def to_internal_value(self, data):
@@ -29,6 +38,28 @@ class ImageFieldSerializer(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class ImageVariantField(serializers.ReadOnlyField):
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def get_url(self, url):
+        request = self.context.get("request")
+        if request is None:
+            return url
+        return request.build_absolute_uri(url)
+
+    def to_representation(self, image):
+        if not image:
+            return None
+        if self.variant is not None:
+            return self.get_url(get_variant_url(image, self.variant))
+        return {
+            name: self.get_url(url)
+            for name, url in get_variant_urls(image).items()
+        }
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -44,9 +75,11 @@ class TagSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
+    viewer_relation_ids = {"authors": "id"}
 
     class Meta:
         model = User
+        list_serializer_class = ViewerRelationsListSerializer
         fields = (
             "email",
             "id",
@@ -57,11 +90,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, object):
-        user = self.context.get("request").user
-        return (
-            not user.is_anonymous
-            and Follow.objects.filter(user=user, author=object.id).exists()
-        )
+        return get_viewer_relations(self.context).is_subscribed(object.id)
 
 
 class UsersCreateSerializer(serializers.ModelSerializer):
@@ -110,11 +139,13 @@ class FollowSerializer(ModelSerializer):
     first_name = serializers.ReadOnlyField(source="user.first_name")
     last_name = serializers.ReadOnlyField(source="user.last_name")
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField(source="user.recipes_count")
     recipes = SerializerMethodField()
+    viewer_relation_ids = {"authors": "user_id"}
 
     class Meta:
         model = Follow
+        list_serializer_class = ViewerRelationsListSerializer
         fields = (
             "email",
             "id",
@@ -143,16 +174,18 @@ class FollowSerializer(ModelSerializer):
         return data
 
     def get_is_subscribed(self, object):
-        user = object.user
-        author = self.context.get("request").user
-        return Follow.objects.filter(user=user, author=author).exists()
-
-    def get_recipes_count(self, object):
-        return Recipe.objects.filter(author=object.user).count()
+        return get_viewer_relations(self.context).is_subscribed(
+            object.user_id
+        )
 
     def get_recipes(self, obj):
-        recipes = Recipe.objects.filter(author=obj.user)
-        serializer = RecipeShortSerializer(recipes, many=True)
+        if hasattr(obj.user, "limited_recipes"):
+            recipes = obj.user.limited_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj.user)
+        serializer = RecipeShortSerializer(
+            recipes, many=True, context=self.context
+        )
         return serializer.data
 
 
@@ -177,18 +210,26 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source="ingredient"
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientInRecipe
         fields = ("id", "amount")
 
 
+def set_prefetched(instance, name, objects):
+    queryset = getattr(instance, name).get_queryset()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, "_prefetched_objects_cache"):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     image = ImageFieldSerializer()
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = AddIngredientSerializer(many=True)
 
     class Meta:
@@ -196,66 +237,53 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "author",
+            "tags",
             "ingredients",
             "name",
             "image",
             "text",
             "cooking_time",
         )
-        read_only_fields = ("tags",)
 
     def validate_tags(self, tags):
         if not tags:
             raise ValidationError("Укажите хотя бы один тег.")
         if len(tags) != len(set(tags)):
             raise ValidationError("Теги не должны повторяться.")
-        for tag in tags:
-            get_object_or_404(Tag, pk=tag)
+        found = Tag.objects.in_bulk(tags)
+        missing = [tag for tag in tags if tag not in found]
+        if missing:
+            raise ValidationError(f"Теги не найдены: {missing}.")
+        return [found[tag] for tag in tags]
 
     def validate_ingredients(self, ingredients):
-        ingredients_list = []
         if not ingredients:
             raise ValidationError("Укажите хотя бы один ингредиент.")
-        for ingredient in ingredients:
-            get_object_or_404(Ingredient, pk=ingredient["id"])
-            try:
-                int(ingredient["amount"])
-            except ValueError:
-                raise ValidationError(
-                    "Количество ингредиента должно быть записано только в "
-                    "виде числа."
-                )
-            if int(ingredient["amount"]) < 0:
-                raise ValidationError("Минимальное количество игредиента - 0.")
-            if ingredient in ingredients_list:
-                raise ValidationError("Ингредиенты не должны повторяться.")
-            ingredients_list.append(ingredient)
-        return ingredients_list
+        ids = [ingredient["id"] for ingredient in ingredients]
+        if len(ids) != len(set(ids)):
+            raise ValidationError("Ингредиенты не должны повторяться.")
+        found = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise ValidationError(f"Ингредиенты не найдены: {missing}.")
+        return [
+            {
+                "ingredient": found[ingredient["id"]],
+                "amount": ingredient["amount"],
+            }
+            for ingredient in ingredients
+        ]
 
     def validate_cooking_time(self, cooking_time):
         if int(cooking_time) < 1:
             raise ValidationError("Минимальное время приготовления - 1 мин.")
+        return cooking_time
 
-    def validate(self, data):
-        tags = self.initial_data.get("tags")
-        self.validate_tags(tags)
-        data["tags"] = tags
-
-        ingredients = self.initial_data.get("ingredients")
-        ingredients_list = self.validate_ingredients(ingredients)
-        data["ingredients"] = ingredients_list
-
-        cooking_time = self.initial_data.get("cooking_time")
-        self.validate_cooking_time(cooking_time)
-
-        return data
-
-    @transaction.atomic
     def get_ingredients(self, recipe, ingredients):
-        IngredientInRecipe.objects.bulk_create(
+        return IngredientInRecipe.objects.bulk_create(
             [
                 IngredientInRecipe(
-                    ingredient=Ingredient.objects.get(id=ingredient["id"]),
+                    ingredient=ingredient["ingredient"],
                     recipe=recipe,
                     amount=ingredient["amount"],
                 )
@@ -263,33 +291,93 @@ class RecipeSerializer(serializers.ModelSerializer):
             ]
         )
 
+    def set_tags(self, recipe, tags):
+        Through = Recipe.tags.through
+        Through.objects.bulk_create(
+            [Through(recipe=recipe, tag=tag) for tag in tags]
+        )
+
     @transaction.atomic
     def create(self, validated_data):
         user = self.context.get("request").user
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
         recipe = Recipe.objects.create(author=user, **validated_data)
-        recipe.tags.set(tags)
-        self.get_ingredients(recipe, ingredients)
+        change_counter("recipes", [user.pk], 1)
+        self.set_tags(recipe, tags)
+        set_prefetched(recipe, "tags", tags)
+        set_prefetched(
+            recipe, "ingredient_in", self.get_ingredients(recipe, ingredients)
+        )
 
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        rows = {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        old_amounts = {pk: row.amount for pk, row in rows.items()}
+        new_amounts = {
+            ingredient["ingredient"].id: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        if old_amounts == new_amounts:
+            return
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for pk, row in rows.items():
+            if pk in new_amounts and row.amount != new_amounts[pk]:
+                row.amount = new_amounts[pk]
+                changed.append(row)
+        IngredientInRecipe.objects.bulk_update(changed, ["amount"])
+        self.get_ingredients(
+            recipe,
+            [
+                ingredient
+                for ingredient in ingredients
+                if ingredient["ingredient"].id not in old_amounts
+            ],
+        )
+        ShoppingListItem.objects.update_amounts(
+            old_amounts,
+            new_amounts,
+            ShoppingListItem.objects.cart_user_ids(recipe),
+        )
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("ingredients")
-
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
 
-        instance.tags.set(tags)
-        self.get_ingredients(instance, ingredients)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, "updated_at"])
 
-        return super().update(instance, validated_data)
+        return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            "tags",
+            Prefetch(
+                "ingredient_in",
+                queryset=IngredientInRecipe.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
         request = self.context.get("request")
         context = {"request": request}
-        return GetRecipeSerializer(instance, context=context).data
+        return GetRecipeDetailSerializer(instance, context=context).data
 
 
 class GetRecipeSerializer(serializers.ModelSerializer):
@@ -298,12 +386,15 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         read_only=True, many=True, source="ingredient_in"
     )
-    image = ImageFieldSerializer()
+    image = ImageVariantField("medium")
+    image_variants = ImageVariantField(source="image")
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
+    viewer_relation_ids = {"recipes": "id", "authors": "author_id"}
 
     class Meta:
         model = Recipe
+        list_serializer_class = ViewerRelationsListSerializer
         fields = (
             "id",
             "tags",
@@ -311,27 +402,27 @@ class GetRecipeSerializer(serializers.ModelSerializer):
             "ingredients",
             "is_favorited",
             "is_in_shopping_cart",
+            "favorites_count",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
 
     def get_is_favorited(self, object):
-        user = self.context.get("request").user
-        return (
-            not user.is_anonymous
-            and user.favorite.filter(recipe=object).exists()
-        )
+        return get_viewer_relations(self.context).is_favorited(object.id)
 
     def get_is_in_shopping_cart(self, object):
-        user = self.context.get("request").user
-        return (
-            not user.is_anonymous
-            and user.shoppingcart.filter(recipe=object).exists()
+        return get_viewer_relations(self.context).is_in_shopping_cart(
+            object.id
         )
 
 
+class GetRecipeDetailSerializer(GetRecipeSerializer):
+    image = ImageVariantField("large")
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
@@ -355,8 +446,31 @@ class ShoppingCartSerializer(FavoriteSerializer):
 
 
 class RecipeShortSerializer(ModelSerializer):
-    image = ImageFieldSerializer()
+    image = ImageVariantField("small")
+    image_variants = ImageVariantField(source="image")
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(
+            min_value=1, max_value=BigIntegerField.MAX_BIGINT
+        ),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class ShoppingListItemSerializer(ModelSerializer):
+    id = serializers.ReadOnlyField(source="ingredient.id")
+    name = serializers.ReadOnlyField(source="ingredient.name")
+    measurement_unit = serializers.ReadOnlyField(
+        source="ingredient.measurement_unit"
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ("id", "name", "measurement_unit", "amount")
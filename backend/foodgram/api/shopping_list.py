@@ -0,0 +1,41 @@
+import csv
+from datetime import datetime
+
+from recipe.models import ShoppingListItem
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    return ShoppingListItem.objects.filter(user=user).order_by(
+        "ingredient__name", "ingredient__measurement_unit"
+    )
+
+
+def stream_txt(user, rows):
+    today = datetime.today()
+    yield (
+        f"Список покупок для: {user.get_full_name()}\n\n"
+        f"Дата: {today:%Y-%m-%d}\n\n"
+    )
+    for name, measurement_unit, amount in rows.iterator(CHUNK_SIZE):
+        yield f"- {name} ({measurement_unit}) - {amount}\n"
+    yield f"\nFoodgram ({today:%Y})\n"
+
+
+def stream_csv(user, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("Ингредиент", "Единица измерения", "Количество"))
+    for row in rows.iterator(CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+STREAMS = {
+    "txt": stream_txt,
+    "csv": stream_csv,
+}
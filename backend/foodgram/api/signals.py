@@ -0,0 +1,118 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from recipe.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipe.signals import bulk_changed, counters_changed
+from users.models import Follow, User
+
+from .cache import bump_generation
+from .ingredient_index import invalidate_index
+from .models import CollectionVersion
+
+VERSIONED_MODELS = {
+    Recipe: "recipe",
+    IngredientInRecipe: "recipe",
+    Recipe.tags.through: "recipe",
+    Tag: "tag",
+    Ingredient: "ingredient",
+    Favorite: "favorite",
+    ShoppingCart: "shoppingcart",
+    User: "user",
+    Follow: "follow",
+}
+RECIPE_CHILDREN = (
+    IngredientInRecipe,
+    Recipe.tags.through,
+    Favorite,
+    ShoppingCart,
+)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(bulk_changed, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_index)
+
+
+def bump_collections(names):
+    for name in sorted(names):
+        CollectionVersion.objects.bump(name)
+        bump_generation(name)
+
+
+def flush_collections(using, names):
+    transaction.get_connection(using).collections_flush = None
+    bump_collections(names)
+
+
+def pending_collections(using=None):
+    connection = transaction.get_connection(using)
+    flush = getattr(connection, "collections_flush", None)
+    if flush is not None and any(
+        entry[1] is flush for entry in connection.run_on_commit
+    ):
+        return flush.args[1]
+    return None
+
+
+def collection_changed(name, using=None):
+    pending = pending_collections(using)
+    if pending is not None:
+        pending.add(name)
+        return
+    flush = partial(flush_collections, using, {name})
+    transaction.get_connection(using).collections_flush = flush
+    transaction.on_commit(flush, using=using)
+
+
+@receiver(counters_changed)
+def counter_changed(sender, **kwargs):
+    collection_changed("counters")
+
+
+def bump_version(sender, update_fields=None, using=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    collection_changed(VERSIONED_MODELS[sender], using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, using=None, **kwargs):
+    collection_changed(VERSIONED_MODELS[sender], using)
+
+
+def child_deleted(sender, using=None, **kwargs):
+    pending = pending_collections(using)
+    if pending is not None and VERSIONED_MODELS[Recipe] in pending:
+        return
+    bump_version(sender, using=using)
+
+
+def bump_version_m2m(sender, action, using=None, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        collection_changed(VERSIONED_MODELS[sender], using)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_version, sender=model)
+    post_delete.connect(
+        child_deleted if model in RECIPE_CHILDREN else bump_version,
+        sender=model,
+    )
+    bulk_changed.connect(bump_version, sender=model)
+m2m_changed.connect(bump_version_m2m, sender=Recipe.tags.through)
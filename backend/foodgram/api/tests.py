@@ -0,0 +1,629 @@
+import json
+import shutil
+import tempfile
+from base64 import b64encode, urlsafe_b64encode
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from recipe.counters import COUNTERS, change_counter, recount
+from recipe.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from .cache import get_cache
+from .models import CollectionVersion
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "foodgram-tests",
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES, SQL_INSTRUMENTATION=False)
+class APITestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            INGREDIENT_INDEX_PATH=f"{cls.media_root}/ingredients.bin",
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.user = cls.create_user("viewer")
+            cls.tags = [
+                Tag.objects.create(
+                    name=f"Тег {i}", color=f"#00000{i}", slug=f"tag-{i}"
+                )
+                for i in range(3)
+            ]
+            cls.ingredients = [
+                Ingredient.objects.create(
+                    name=f"Ингредиент {i}", measurement_unit="г"
+                )
+                for i in range(10)
+            ]
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username,
+            email=f"{username}@example.com",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+
+    @classmethod
+    def create_recipe(cls, author, ingredients=3, name="Рецепт"):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text="Описание", cooking_time=10
+        )
+        recipe.tags.set(cls.tags[:2])
+        IngredientInRecipe.objects.bulk_create(
+            [
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1
+                )
+                for i, ingredient in enumerate(cls.ingredients[:ingredients])
+            ]
+        )
+        return recipe
+
+    @staticmethod
+    def sync_aggregates():
+        for name, (model, *_) in COUNTERS.items():
+            recount(name, model.objects.values_list("pk", flat=True))
+        ShoppingListItem.objects.rebuild()
+
+    def count_queries(self, method, path, data=None):
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path, data, format="json")
+        return response, len(context.captured_queries)
+
+
+class RecipeQueryCountTests(APITestCase):
+    def assertConstantQueries(self, path, grow):
+        response, queries = self.count_queries("get", path)
+        self.assertEqual(response.status_code, 200)
+        grow()
+        get_cache().clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_queries_do_not_grow_with_recipes(self):
+        author = self.create_user("author")
+        self.create_recipe(author)
+
+        def grow():
+            for i in range(5):
+                self.create_recipe(
+                    self.create_user(f"author{i}"), ingredients=6
+                )
+
+        response = self.assertConstantQueries("/api/recipes/", grow)
+        self.assertEqual(len(response.data["results"]), 6)
+
+    def test_detail_queries_do_not_grow_with_ingredients(self):
+        recipe = self.create_recipe(self.create_user("author"), 1)
+
+        def grow():
+            IngredientInRecipe.objects.bulk_create(
+                [
+                    IngredientInRecipe(
+                        recipe=recipe, ingredient=ingredient, amount=1
+                    )
+                    for ingredient in self.ingredients[1:]
+                ]
+            )
+            recipe.tags.set(self.tags)
+
+        response = self.assertConstantQueries(
+            f"/api/recipes/{recipe.pk}/", grow
+        )
+        self.assertEqual(len(response.data["ingredients"]), 10)
+
+
+class SubscriptionsTests(APITestCase):
+    path = "/api/users/subscriptions/"
+
+    def follow(self, name, recipes):
+        author = self.create_user(name)
+        Follow.objects.create(author=self.user, user=author)
+        now = timezone.now()
+        created = []
+        for i in range(recipes):
+            recipe = self.create_recipe(author, name=f"{name} {i}")
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(days=i)
+            )
+            created.append(recipe.pk)
+        return author, created
+
+    def test_queries_do_not_grow_with_authors(self):
+        self.follow("author", 2)
+        self.sync_aggregates()
+        path = f"{self.path}?recipes_limit=2"
+        response, queries = self.count_queries("get", path)
+        self.assertEqual(response.status_code, 200)
+        for i in range(4):
+            self.follow(f"author{i}", 3)
+        self.sync_aggregates()
+        get_cache().clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(path)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_recipes_limit_returns_newest_recipes(self):
+        author, recipes = self.follow("author", 4)
+        self.sync_aggregates()
+        response = self.client.get(f"{self.path}?recipes_limit=2")
+        self.assertEqual(response.status_code, 200)
+        [result] = response.data["results"]
+        self.assertEqual(result["id"], author.pk)
+        self.assertEqual(result["recipes_count"], 4)
+        self.assertEqual(
+            [recipe["id"] for recipe in result["recipes"]], recipes[:2]
+        )
+
+    def test_without_recipes_limit_returns_all_recipes(self):
+        self.follow("author", 3)
+        response = self.client.get(self.path)
+        [result] = response.data["results"]
+        self.assertEqual(len(result["recipes"]), 3)
+
+    def test_invalid_recipes_limit_is_rejected(self):
+        for value in ("0", "-1", "abc"):
+            with self.subTest(recipes_limit=value):
+                response = self.client.get(
+                    f"{self.path}?recipes_limit={value}"
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("recipes_limit", response.data)
+
+
+class ShoppingListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.first = self.create_recipe(self.author, ingredients=4)
+        self.second = self.create_recipe(self.author, ingredients=2)
+        self.sync_aggregates()
+
+    def assertAggregatesMatch(self):
+        self.assertEqual(
+            ShoppingListItem.objects.stored(),
+            ShoppingListItem.objects.expected(),
+        )
+        call_command("rebuild_shopping_lists", verify=True, stdout=StringIO())
+
+    def test_aggregates_follow_cart_changes(self):
+        path = "/api/recipes/{}/shopping_cart/"
+        response = self.client.post(path.format(self.first.pk))
+        self.assertEqual(response.status_code, 201)
+        self.client.post(
+            "/api/recipes/shopping_cart/",
+            {"recipes": [self.second.pk]},
+            format="json",
+        )
+        self.assertAggregatesMatch()
+        self.assertEqual(
+            ShoppingListItem.objects.stored()[
+                (self.user.pk, self.ingredients[0].pk)
+            ],
+            2,
+        )
+        response = self.client.delete(path.format(self.first.pk))
+        self.assertEqual(response.status_code, 204)
+        self.assertAggregatesMatch()
+        self.assertEqual(len(ShoppingListItem.objects.stored()), 2)
+        self.client.delete(
+            "/api/recipes/shopping_cart/",
+            {"recipes": [self.second.pk]},
+            format="json",
+        )
+        self.assertAggregatesMatch()
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_aggregates_follow_recipe_delete(self):
+        other = self.create_user("other")
+        for user in (self.user, other):
+            self.client.force_authenticate(user)
+            self.client.post(
+                "/api/recipes/shopping_cart/",
+                {"recipes": [self.first.pk, self.second.pk]},
+                format="json",
+            )
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f"/api/recipes/{self.first.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertAggregatesMatch()
+        self.assertEqual(len(ShoppingListItem.objects.stored()), 4)
+
+    def test_aggregates_follow_ingredient_update(self):
+        other = self.create_user("other")
+        for user in (self.user, other):
+            ShoppingCart.objects.create(user=user, recipe=self.first)
+        ShoppingCart.objects.create(user=self.user, recipe=self.second)
+        self.sync_aggregates()
+        self.client.force_authenticate(self.author)
+        ingredients = [
+            {"id": self.ingredients[0].pk, "amount": 7},
+            {"id": self.ingredients[2].pk, "amount": 3},
+            {"id": self.ingredients[5].pk, "amount": 4},
+        ]
+        response = self.client.patch(
+            f"/api/recipes/{self.first.pk}/",
+            {"ingredients": ingredients, "tags": [self.tags[0].pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertAggregatesMatch()
+        stored = ShoppingListItem.objects.stored()
+        self.assertEqual(stored[(self.user.pk, self.ingredients[0].pk)], 8)
+        self.assertEqual(stored[(other.pk, self.ingredients[5].pk)], 4)
+        self.assertNotIn((other.pk, self.ingredients[1].pk), stored)
+
+    def test_verify_reports_drift(self):
+        self.client.post(f"/api/recipes/{self.first.pk}/shopping_cart/")
+        ShoppingListItem.objects.filter(user=self.user).update(amount=100)
+        with self.assertRaises(CommandError):
+            call_command(
+                "rebuild_shopping_lists", verify=True, stdout=StringIO()
+            )
+        call_command("rebuild_shopping_lists", stdout=StringIO())
+        self.assertAggregatesMatch()
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = self.create_recipe(self.create_user("author"))
+
+    def versions(self, *names):
+        return [
+            version
+            for version, _ in CollectionVersion.objects.get_versions(names)
+        ]
+
+    def test_unchanged_list_returns_not_modified(self):
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_write_changes_etag(self):
+        for path in ("/api/recipes/", f"/api/recipes/{self.recipe.pk}/"):
+            with self.subTest(path=path):
+                etag = self.client.get(path)["ETag"]
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post(
+                        f"/api/recipes/{self.recipe.pk}/favorite/"
+                    )
+                self.assertEqual(response.status_code, 201)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.delete(
+                        f"/api/recipes/{self.recipe.pk}/favorite/"
+                    )
+
+    def test_recipe_delete_bumps_collections_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sync_aggregates()
+            Favorite.objects.create(user=self.user, recipe=self.recipe)
+            ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        before = self.versions("recipe", "favorite", "shoppingcart")
+        self.client.force_authenticate(self.recipe.author)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.delete(f"/api/recipes/{self.recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            self.versions("recipe", "favorite", "shoppingcart"),
+            [before[0] + 1, *before[1:]],
+        )
+
+
+class AnonymousCacheTests(APITestCase):
+    path = "/api/recipes/"
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = self.create_recipe(self.create_user("author"))
+        self.anonymous = APIClient()
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.anonymous.get(self.path)
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.anonymous.get(self.path)
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_unknown_params_bypass_cache(self):
+        for _ in range(2):
+            response = self.anonymous.get(f"{self.path}?unknown=1")
+            self.assertEqual(response["X-Cache"], "BYPASS")
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.client.get(self.path)
+        response = self.client.get(self.path)
+        self.assertFalse(response.has_header("X-Cache"))
+
+    def test_write_invalidates_cache(self):
+        self.anonymous.get(self.path)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        response = self.anonymous.get(self.path)
+        self.assertEqual(response["X-Cache"], "MISS")
+        [result] = response.json()["results"]
+        self.assertEqual(result["favorites_count"], 1)
+        self.assertEqual(self.anonymous.get(self.path)["X-Cache"], "HIT")
+
+
+class KeysetPaginationTests(APITestCase):
+    path = "/api/recipes/?cursor=&limit=2"
+
+    def setUp(self):
+        super().setUp()
+        author = self.create_user("author")
+        now = timezone.now()
+        for i in range(7):
+            recipe = self.create_recipe(author, ingredients=1)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(days=i // 2)
+            )
+        self.expected = list(
+            Recipe.objects.order_by("-pub_date", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+    def walk(self, url, link):
+        pages, response = [], None
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe["id"] for recipe in response.data["results"]])
+            url = response.data[link]
+        return pages, response
+
+    def test_next_and_previous_links_cover_all_recipes(self):
+        pages, last = self.walk(self.path, "next")
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertIsNone(self.client.get(self.path).data["previous"])
+        backward, first = self.walk(last.data["previous"], "previous")
+        self.assertEqual(backward, pages[-2::-1])
+        self.assertIsNotNone(first.data["next"])
+
+    def test_invalid_cursor_returns_not_found(self):
+        encode = urlsafe_b64encode
+        cursors = (
+            "garbage",
+            encode(b"[]").decode(),
+            encode(json.dumps({"sideways": ["x", "1"]}).encode()).decode(),
+            encode(json.dumps({"after": ["x", "1"]}).encode()).decode(),
+            encode(json.dumps({"after": ["1"]}).encode()).decode(),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/recipes/?cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data["detail"], "Неверный курсор.")
+
+
+class RecipeCreateTests(APITestCase):
+    path = "/api/recipes/"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+        cls.image = (
+            f"data:image/png;base64,{b64encode(buffer.getvalue()).decode()}"
+        )
+
+    def payload(self, ingredients, tags):
+        return {
+            "name": "Новый рецепт",
+            "text": "Описание",
+            "cooking_time": 15,
+            "image": self.image,
+            "tags": [tag.pk for tag in self.tags[:tags]],
+            "ingredients": [
+                {"id": ingredient.pk, "amount": i + 1}
+                for i, ingredient in enumerate(self.ingredients[:ingredients])
+            ],
+        }
+
+    def test_create_queries_do_not_grow_with_ingredients(self):
+        response, queries = self.count_queries(
+            "post", self.path, self.payload(1, 1)
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        with self.assertNumQueries(queries):
+            response = self.client.post(
+                self.path, self.payload(10, 3), format="json"
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.ingredient_in.count(), 10)
+        self.assertEqual(recipe.tags.count(), 3)
+        self.assertEqual(len(response.data["ingredients"]), 10)
+
+
+class BulkRelationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        author = self.create_user("author")
+        self.recipes = [self.create_recipe(author) for _ in range(3)]
+        self.sync_aggregates()
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (result["id"], result["status"])
+            for result in response.data["results"]
+        ]
+
+    def test_bulk_add_and_remove_statuses(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        missing = third + 100
+        relations = ((Favorite, "favorite"), (ShoppingCart, "shopping_cart"))
+        for model, action in relations:
+            path = f"/api/recipes/{action}/"
+            with self.subTest(path=path):
+                self.client.post(f"/api/recipes/{first}/{action}/")
+                response = self.client.post(
+                    path,
+                    {"recipes": [first, second, missing, second, third]},
+                    format="json",
+                )
+                self.assertEqual(
+                    self.statuses(response),
+                    [
+                        (first, "exists"),
+                        (second, "added"),
+                        (missing, "not_found"),
+                        (third, "added"),
+                    ],
+                )
+                response = self.client.delete(
+                    path, {"recipes": [second, missing]}, format="json"
+                )
+                self.assertEqual(
+                    self.statuses(response),
+                    [(second, "deleted"), (missing, "absent")],
+                )
+                self.assertEqual(
+                    set(
+                        model.objects.filter(user=self.user).values_list(
+                            "recipe_id", flat=True
+                        )
+                    ),
+                    {first, third},
+                )
+        self.assertEqual(
+            list(
+                Recipe.objects.filter(pk__in=[first, second, third])
+                .order_by("pk")
+                .values_list("favorites_count", "in_carts_count")
+            ),
+            [(1, 1), (0, 0), (1, 1)],
+        )
+
+    def test_out_of_range_ids_are_rejected(self):
+        huge = 2 ** 63
+        for path in ("/api/recipes/favorite/", "/api/recipes/shopping_cart/"):
+            with self.subTest(path=path):
+                response = self.client.post(
+                    path, {"recipes": [huge]}, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+                response = self.client.post(
+                    path, {"recipes": [0]}, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+        for action in ("favorite", "shopping_cart"):
+            for method in ("post", "delete"):
+                with self.subTest(action=action, method=method):
+                    response = getattr(self.client, method)(
+                        f"/api/recipes/{huge}/{action}/"
+                    )
+                    self.assertEqual(response.status_code, 404)
+
+
+class CounterReconciliationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = self.create_user("author")
+            self.recipe = self.create_recipe(self.author)
+            self.sync_aggregates()
+
+    def recount(self, **options):
+        call_command("recount_counters", stdout=StringIO(), **options)
+
+    def test_api_writes_keep_counters_in_sync(self):
+        self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.client.post(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+        self.client.post(f"/api/users/{self.author.pk}/subscribe/")
+        self.client.force_authenticate(self.author)
+        other = self.create_recipe(self.author)
+        change_counter("recipes", [self.author.pk], 1)
+        self.client.delete(f"/api/recipes/{other.pk}/")
+        self.recount(verify=True)
+        self.author.refresh_from_db()
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            (self.author.recipes_count, self.author.followers_count), (1, 1)
+        )
+        self.assertEqual(
+            (self.recipe.favorites_count, self.recipe.in_carts_count), (1, 1)
+        )
+
+    def test_verify_reports_drift_and_recount_fixes_it(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=5)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=3)
+        with self.assertRaisesMessage(CommandError, "Расхождений: 2"):
+            self.recount(verify=True)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 5)
+        etag = self.client.get("/api/recipes/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recount()
+        self.recount(verify=True)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertNotEqual(self.client.get("/api/recipes/")["ETag"], etag)
+
+    def test_recount_limited_to_counter(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=5)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=3)
+        self.recount(counters=["favorites"])
+        self.recount(verify=True, counters=["favorites"])
+        with self.assertRaisesMessage(CommandError, "Расхождений: 1"):
+            self.recount(verify=True)
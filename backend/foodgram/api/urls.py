@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import async_patterns
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 app_name = "api"
@@ -10,8 +12,12 @@ router.register(r"ingredients", IngredientViewSet, basename="ingredients")
 router.register(r"recipes", RecipeViewSet, basename="recipes")
 router.register(r"tags", TagViewSet, basename="tags")
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = async_patterns(router_urls)
+
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(router_urls)),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
 ]
@@ -1,6 +1,6 @@
-from datetime import datetime
 from rest_framework.serializers import ValidationError
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import BigIntegerField, OuterRef, Prefetch, Subquery
 from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -12,31 +12,45 @@ from recipe.models import (
     IngredientInRecipe,
     Favorite,
     ShoppingCart,
+    ShoppingListItem,
 )
 from users.models import User, Follow
 from .paginate import CustomPagination
-from django.http import HttpResponse
+from django.http import Http404, StreamingHttpResponse
 from rest_framework.status import HTTP_400_BAD_REQUEST
 from django.shortcuts import get_object_or_404
+from recipe.counters import RELATION_COUNTERS, change_counter
 from .filters import RecipeFilter, IngredientFilter
+from .ingredient_index import get_index, search_ingredients
+from .mixins import CachedListMixin, ConditionalGetMixin
 from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
+    GetRecipeDetailSerializer,
     GetRecipeSerializer,
     UserSerializer,
     FollowSerializer,
     TagSerializer,
+    RecipeIdsSerializer,
     RecipeShortSerializer,
+    ShoppingListItemSerializer,
 )
 from djoser.views import UserViewSet
 from .permissions import IsAuthorOrReadOnly
+from .renderers import CSVRenderer, PlainTextRenderer
+from .shopping_list import STREAMS, get_shopping_list
+from .signals import VERSIONED_MODELS, collection_changed
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, SAFE_METHODS
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(ConditionalGetMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = CustomPagination
+    keyset_ordering = ("id",)
+    versioned_collections = ("user",)
+    viewer_collections = ("follow",)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def me(self, request):
@@ -44,9 +58,47 @@ class UserViewSet(UserViewSet):
         serializer = self.get_serializer(user)
         return Response(serializer.data)
 
+    def get_recipes_limit(self, request):
+        recipes_limit = request.query_params.get("recipes_limit")
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise ValidationError(
+                {"recipes_limit": "Значение должно быть целым числом."}
+            )
+        if recipes_limit < 1:
+            raise ValidationError(
+                {"recipes_limit": "Значение должно быть больше нуля."}
+            )
+        return recipes_limit
+
+    def get_follow_queryset(self, request):
+        recipes = Recipe.objects.order_by("-pub_date", "-id")
+        recipes_limit = self.get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(
+                id__in=Subquery(
+                    Recipe.objects.filter(author=OuterRef("author"))
+                    .order_by("-pub_date", "-id")
+                    .values("id")[:recipes_limit]
+                )
+            )
+        return (
+            Follow.objects.filter(author=request.user)
+            .select_related("user")
+            .prefetch_related(
+                Prefetch(
+                    "user__recipe", queryset=recipes, to_attr="limited_recipes"
+                )
+            )
+            .order_by("id")
+        )
+
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        queryset = Follow.objects.filter(author=request.user)
+        queryset = self.get_follow_queryset(request)
         page = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             page, many=True, context={"request": request}
@@ -66,6 +118,7 @@ class UserViewSet(UserViewSet):
         elif request.method == "POST":
             return self.add_subscribe(Follow, request, id)
 
+    @transaction.atomic
     def add_subscribe(self, model, request, id):
         author = request.user
         user = get_object_or_404(User, id=id)
@@ -78,9 +131,12 @@ class UserViewSet(UserViewSet):
                 {"errors": "Вы уже подписаны на этого пользователя."}
             )
         follow = model.objects.create(user=user, author=author)
+        change_counter("followers", [user.pk], 1)
+        follow = self.get_follow_queryset(request).get(pk=follow.pk)
         serializer = FollowSerializer(follow, context={"request": request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def del_subscribe(self, model, request, id):
         author = request.user
         user = get_object_or_404(User, id=id)
@@ -88,42 +144,109 @@ class UserViewSet(UserViewSet):
             raise ValidationError(
                 {"errors": "Вы не можете отписаться от самого себя."}
             )
-        elif model.objects.filter(user=user, author=author).exists():
-            model.objects.filter(user=user, author=author).delete()
+        deleted, _ = model.objects.filter(user=user, author=author).delete()
+        if deleted:
+            change_counter("followers", [user.pk], -deleted)
             return Response(status=status.HTTP_204_NO_CONTENT)
         raise ValidationError(
             {"errors": "Вы не подписаны на этого пользователя."}
         )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     permission_classes = (AllowAny,)
     pagination_class = None
+    versioned_collections = ("ingredient",)
+
+    def get_version_stamps(self, request):
+        try:
+            index = get_index()
+        except (OSError, ValueError):
+            return super().get_version_stamps(request)
+        return [index.stamp], [index.modified]
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.search, request, *args, **kwargs)
 
+    def search(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name is not None:
+            ingredients = search_ingredients(name)
+            if ingredients is not None:
+                return Response(ingredients)
+        return super(ConditionalGetMixin, self).list(request, *args, **kwargs)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    versioned_collections = ("tag",)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    CachedListMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPagination
+    keyset_ordering = ("-pub_date", "-id")
+    versioned_collections = ("recipe", "tag", "ingredient", "user")
+    viewer_collections = ("favorite", "shoppingcart", "follow")
+    cache_collections = ("recipe", "tag", "ingredient", "user", "counters")
+
+    def get_versioned_collections(self, request):
+        names = (*super().get_versioned_collections(request), "counters")
+        if self.action == "retrieve":
+            return tuple(name for name in names if name != "recipe")
+        return names
+
+    def get_object_modified(self):
+        if self.action != "retrieve":
+            return None
+        return (
+            Recipe.objects.filter(pk=self.kwargs["pk"])
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+
+    def get_queryset(self):
+        return (
+            Recipe.objects.select_related("author")
+            .defer("search_vector")
+            .prefetch_related(
+                "tags",
+                Prefetch(
+                    "ingredient_in",
+                    queryset=IngredientInRecipe.objects.select_related(
+                        "ingredient"
+                    ),
+                ),
+            )
+        )
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
+            if self.action == "retrieve":
+                return GetRecipeDetailSerializer
             return GetRecipeSerializer
         return RecipeSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingListItem.objects.remove_recipe(
+            instance, ShoppingListItem.objects.cart_user_ids(instance)
+        )
+        instance.delete()
+        change_counter("recipes", [instance.author_id], -1)
+
     @action(
         detail=True,
         methods=["post", "delete"],
@@ -146,21 +269,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
         else:
             return self.delete_from(ShoppingCart, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite",
+        url_name="favorite-bulk",
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_bulk(self, request):
+        return self.bulk(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart",
+        url_name="shopping-cart-bulk",
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk(ShoppingCart, request)
+
+    def bulk(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        if request.method == "POST":
+            results = self.add_to_many(model, request.user, recipe_ids)
+        else:
+            results = self.delete_from_many(model, request.user, recipe_ids)
+        return Response(
+            {
+                "results": [
+                    {"id": pk, "status": results[pk]} for pk in recipe_ids
+                ]
+            }
+        )
+
+    def relations_changed(self, model, user, recipe_ids, added):
+        delta = 1 if added else -1
+        change_counter(RELATION_COUNTERS[model], recipe_ids, delta)
+        if model is ShoppingCart:
+            if added:
+                ShoppingListItem.objects.add_recipes(recipe_ids, [user.id])
+            else:
+                ShoppingListItem.objects.remove_recipes(recipe_ids, [user.id])
+        collection_changed(VERSIONED_MODELS[model])
+
+    @transaction.atomic
+    def add_to_many(self, model, user, recipe_ids):
+        added = model.objects.add(user, recipe_ids)
+        if added:
+            self.relations_changed(model, user, added, True)
+        results = dict.fromkeys(added, "added")
+        rest = [pk for pk in recipe_ids if pk not in results]
+        if rest:
+            existing = set(
+                Recipe.objects.filter(id__in=rest).values_list("id", flat=True)
+            )
+            for pk in rest:
+                results[pk] = "exists" if pk in existing else "not_found"
+        return results
+
+    @transaction.atomic
+    def delete_from_many(self, model, user, recipe_ids):
+        deleted = model.objects.remove(user, recipe_ids)
+        if deleted:
+            self.relations_changed(model, user, deleted, False)
+        deleted = set(deleted)
+        return {
+            pk: "deleted" if pk in deleted else "absent" for pk in recipe_ids
+        }
+
+    def get_recipe_id(self, pk):
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise Http404
+        if not 1 <= pk <= BigIntegerField.MAX_BIGINT:
+            raise Http404
+        return pk
+
     def add_to(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+        pk = self.get_recipe_id(pk)
+        result = self.add_to_many(model, user, [pk])[pk]
+        if result == "not_found":
+            raise Http404
+        if result == "exists":
             return Response(
                 {"errors": "Рецепт уже добавлен!"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeShortSerializer(recipe)
+        serializer = RecipeShortSerializer(
+            Recipe.objects.get(id=pk), context={"request": self.request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_from(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        pk = self.get_recipe_id(pk)
+        if self.delete_from_many(model, user, [pk])[pk] == "deleted":
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"errors": "Рецепт уже удален!"},
@@ -168,36 +374,31 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False, permission_classes=[IsAuthenticated])
+    def shopping_cart_preview(self, request):
+        items = get_shopping_list(request.user).select_related("ingredient")
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer],
+    )
     def download_shopping_cart(self, request):
         user = request.user
-        if not user.shopping_cart.exists():
+        if not user.shoppingcart.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        ingredients = (
-            IngredientInRecipe.objects.filter(
-                recipe__shopping_cart__user=request.user
-            )
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(full_amount=Sum("amount"))
-        )
-
-        today = datetime.today()
-        shopping_list = (
-            f"Список покупок для: {user.get_full_name()}\n\n"
-            f"Дата: {today:%Y-%m-%d}\n\n"
+        renderer = request.accepted_renderer
+        rows = get_shopping_list(user).values_list(
+            "ingredient__name", "ingredient__measurement_unit", "amount"
         )
-        shopping_list += "\n".join(
-            [
-                f'- {ingredient["ingredient__name"]} '
-                f'({ingredient["ingredient__measurement_unit"]})'
-                f' - {ingredient["amount"]}'
-                for ingredient in ingredients
-            ]
+        stream = STREAMS[renderer.format](user, rows)
+        filename = f"{user.username}_shopping_list.{renderer.format}"
+        response = StreamingHttpResponse(
+            stream,
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
         )
-        shopping_list += f"\n\nFoodgram ({today:%Y})"
-
-        filename = f"{user.username}_shopping_list.txt"
-        response = HttpResponse(shopping_list, content_type="text/plain")
         response["Content-Disposition"] = f"attachment; filename={filename}"
 
         return response
@@ -0,0 +1,88 @@
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.management.base import SystemCheckError
+from django.db import connections
+from django.test import Client
+from django.urls import get_resolver, resolve
+from rest_framework.utils import model_meta
+
+from .ingredient_index import get_index
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PATHS = ("/api/tags/", "/api/ingredients/", "/api/recipes/")
+
+
+def run_checks():
+    errors = [
+        message for message in checks.run_checks() if message.is_serious()
+    ]
+    if errors:
+        raise SystemCheckError("\n".join(map(str, errors)))
+
+
+def resolve_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict
+    resolver.namespace_dict
+    for path in WARMUP_PATHS:
+        resolve(path)
+
+
+def load_model_meta():
+    for model in apps.get_models():
+        model_meta.get_field_info(model)
+
+
+def load_reference_data():
+    get_index()
+    host = next(
+        (
+            host.lstrip(".")
+            for host in settings.ALLOWED_HOSTS
+            if host and host != "*"
+        ),
+        "localhost",
+    )
+    client = Client(HTTP_HOST=host)
+    for path in WARMUP_PATHS:
+        response = client.get(path)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        if response.status_code != 200:
+            logger.warning(
+                "Прогрев %s: ответ %s", path, response.status_code
+            )
+
+
+PRELOAD_STEPS = (
+    ("checks", run_checks),
+    ("urls", resolve_urls),
+    ("models", load_model_meta),
+)
+WORKER_STEPS = (("reference_data", load_reference_data),)
+STEPS = PRELOAD_STEPS + WORKER_STEPS
+
+
+def warmup(steps=STEPS):
+    timings = {}
+    try:
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except SystemCheckError:
+                raise
+            except Exception:
+                logger.exception("Прогрев: шаг %s не выполнен", name)
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    finally:
+        connections.close_all()
+        for cache in caches.all():
+            cache.close()
+    return timings
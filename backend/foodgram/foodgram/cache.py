@@ -0,0 +1,49 @@
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import (
+    FileBasedCache as BaseFileBasedCache,
+)
+from django.core.files import locks
+
+
+class FileBasedCache(BaseFileBasedCache):
+    lock_suffix = ".lock"
+
+    @contextmanager
+    def locked(self, fname):
+        self._createdir()
+        with open(fname + self.lock_suffix, "ab") as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self.locked(self._key_to_file(key, version)):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self.locked(fname):
+            try:
+                with open(fname, "rb") as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                raise ValueError(f"Key '{key}' not found")
+            now = time.time()
+            if expiry is not None and expiry < now:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            self.set(
+                key,
+                value,
+                None if expiry is None else expiry - now,
+                version,
+            )
+            return value
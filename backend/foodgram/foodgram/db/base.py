@@ -0,0 +1,29 @@
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from .creation import DatabaseCreation
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(
+            self.alias, conn_params, self.settings_dict.get("POOL", {})
+        )
+        connection = self.pool.checkout(
+            partial(super().get_new_connection, conn_params)
+        )
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            with self.wrap_database_errors:
+                self.pool.checkin(connection)
@@ -0,0 +1,9 @@
+from django.db.backends.postgresql import creation
+
+from .pool import close_idle_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_idle_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
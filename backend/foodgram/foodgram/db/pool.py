@@ -0,0 +1,326 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+import psycopg2
+from django.conf import settings
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+    TRANSACTION_STATUS_INTRANS,
+)
+
+DEFAULTS = {
+    "MAX_SIZE": 10,
+    "TIMEOUT": 5,
+    "MAX_LIFETIME": 1800,
+    "MAX_IDLE": 300,
+    "CHECK_INTERVAL": 30,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_inherited = []
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class Pool:
+    def __init__(self, alias, options):
+        options = {**DEFAULTS, **options}
+        self.alias = alias
+        self.max_size = options["MAX_SIZE"]
+        self.timeout = options["TIMEOUT"]
+        self.max_lifetime = options["MAX_LIFETIME"]
+        self.max_idle = options["MAX_IDLE"]
+        self.check_interval = options["CHECK_INTERVAL"]
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.idle = deque()
+        self.leased = {}
+        self.size = 0
+        self.peak = 0
+        self.stats = Counter()
+        self.closed = Counter()
+        self.next_publish = 0
+
+    def checkout(self, connect):
+        start = time.monotonic()
+        expired = []
+        try:
+            while True:
+                entry = self.acquire(start, expired)
+                if entry is None:
+                    connection = self.create(connect)
+                    created = time.monotonic()
+                    break
+                connection, created, released = entry
+                if self.is_healthy(connection, released):
+                    break
+                self.discard(connection, "broken")
+        finally:
+            for stale in expired:
+                close(stale)
+        elapsed = time.monotonic() - start
+        with self.lock:
+            self.leased[id(connection)] = created
+            self.peak = max(self.peak, len(self.leased))
+            self.stats["checkouts"] += 1
+            self.stats["checkout_seconds"] += elapsed
+            self.stats["checkout_seconds_max"] = max(
+                self.stats["checkout_seconds_max"], elapsed
+            )
+        return connection
+
+    def acquire(self, start, expired):
+        deadline = start + self.timeout
+        waited = False
+        with self.available:
+            while True:
+                now = time.monotonic()
+                self.expire_idle(now, expired)
+                if self.idle:
+                    return self.idle.pop()
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Все {self.max_size} соединений пула {self.alias} "
+                        f"заняты дольше {self.timeout} с."
+                    )
+                if not waited:
+                    waited = True
+                    self.stats["waits"] += 1
+                wait_start = time.monotonic()
+                self.available.wait(remaining)
+                self.stats["wait_seconds"] += time.monotonic() - wait_start
+
+    def expire_idle(self, now, expired):
+        while self.idle:
+            connection, created, released = self.idle[0]
+            if now - released < self.max_idle:
+                break
+            self.idle.popleft()
+            self.forget(connection, "idle", expired)
+        for entry in list(self.idle):
+            if now - entry[1] >= self.max_lifetime:
+                self.idle.remove(entry)
+                self.forget(entry[0], "lifetime", expired)
+
+    def forget(self, connection, reason, expired):
+        self.size -= 1
+        self.closed[reason] += 1
+        expired.append(connection)
+        self.available.notify()
+
+    def create(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.available:
+                self.size -= 1
+                self.stats["connect_errors"] += 1
+                self.available.notify()
+            raise
+        with self.lock:
+            self.stats["created"] += 1
+        return connection
+
+    def is_healthy(self, connection, released):
+        if connection.closed:
+            return False
+        if time.monotonic() - released < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        with self.lock:
+            self.stats["health_checks"] += 1
+        return True
+
+    def checkin(self, connection):
+        now = time.monotonic()
+        with self.lock:
+            created = self.leased.pop(id(connection), None)
+        if created is None:
+            _inherited.append(connection)
+            return
+        reason = None
+        if connection.closed:
+            reason = "broken"
+        elif now - created >= self.max_lifetime:
+            reason = "lifetime"
+        else:
+            status = connection.info.transaction_status
+            if status in (
+                TRANSACTION_STATUS_INTRANS,
+                TRANSACTION_STATUS_INERROR,
+            ):
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    reason = "broken"
+            elif status != TRANSACTION_STATUS_IDLE:
+                reason = "broken"
+        if reason is not None:
+            self.discard(connection, reason)
+        else:
+            with self.available:
+                self.idle.append((connection, created, now))
+                self.available.notify()
+        if now >= self.next_publish:
+            self.next_publish = now + settings.DB_POOL_STATS_INTERVAL
+            publish(self)
+
+    def discard(self, connection, reason):
+        close(connection)
+        with self.available:
+            self.size -= 1
+            self.closed[reason] += 1
+            self.available.notify()
+
+    def close_idle(self):
+        with self.available:
+            idle, self.idle = list(self.idle), deque()
+            self.size -= len(idle)
+            self.closed["drain"] += len(idle)
+        for connection, _, _ in idle:
+            close(connection)
+
+    def forget_all(self):
+        _inherited.extend(connection for connection, _, _ in self.idle)
+        self.reset()
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            in_use = len(self.leased)
+            return {
+                "alias": self.alias,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "max_size": self.max_size,
+                "size": self.size,
+                "in_use": in_use,
+                "idle": len(self.idle),
+                "peak_in_use": self.peak,
+                "saturation": round(in_use / self.max_size, 3),
+                "checkouts": stats.get("checkouts", 0),
+                "waits": stats.get("waits", 0),
+                "wait_ms": round(stats.get("wait_seconds", 0) * 1000, 1),
+                "checkout_ms": round(
+                    stats.get("checkout_seconds", 0) * 1000, 1
+                ),
+                "checkout_ms_max": round(
+                    stats.get("checkout_seconds_max", 0) * 1000, 1
+                ),
+                "timeouts": stats.get("timeouts", 0),
+                "created": stats.get("created", 0),
+                "connect_errors": stats.get("connect_errors", 0),
+                "health_checks": stats.get("health_checks", 0),
+                "closed": dict(self.closed),
+            }
+
+
+def close(connection):
+    try:
+        connection.close()
+    except psycopg2.Error:
+        pass
+
+
+def get_pool(alias, conn_params, options):
+    key = (alias, tuple(sorted((k, str(v)) for k, v in conn_params.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, Pool(alias, options))
+    return pool
+
+
+def stats_path(pool):
+    return os.path.join(
+        settings.DB_POOL_STATS_DIR,
+        f"{socket.gethostname()}-{os.getpid()}-{pool.alias}.json",
+    )
+
+
+def publish(pool):
+    directory = settings.DB_POOL_STATS_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump(pool.snapshot(), f)
+            os.replace(tmp_path, stats_path(pool))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def read_published():
+    directory = settings.DB_POOL_STATS_DIR
+    stale = time.time() - settings.DB_POOL_STATS_INTERVAL * 3
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    published = []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < stale:
+                os.remove(path)
+                continue
+            with open(path, encoding="utf-8") as f:
+                published.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return published
+
+
+def collect_stats():
+    local = [pool.snapshot() for pool in list(_pools.values())]
+    own = {(stats["host"], stats["pid"], stats["alias"]) for stats in local}
+    return local + [
+        stats
+        for stats in read_published()
+        if (stats["host"], stats["pid"], stats["alias"]) not in own
+    ]
+
+
+def close_idle_pools(alias=None):
+    for pool in list(_pools.values()):
+        if alias is None or pool.alias == alias:
+            pool.close_idle()
+
+
+def forget_pools():
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool.forget_all()
+
+
+os.register_at_fork(before=close_idle_pools, after_in_child=forget_pools)
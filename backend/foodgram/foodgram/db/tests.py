@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INTRANS,
+)
+
+from foodgram.db import pool as db_pool
+
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        self.connection.pings += 1
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.pings = 0
+        self.info = FakeInfo()
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class PoolTests(SimpleTestCase):
+    def setUp(self):
+        self.stats_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.stats_dir, True)
+        settings = override_settings(DB_POOL_STATS_DIR=self.stats_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.created = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.created.append(connection)
+        return connection
+
+    def make_pool(self, **options):
+        return db_pool.Pool(
+            "test",
+            {
+                "MAX_SIZE": 3,
+                "TIMEOUT": 0.2,
+                "MAX_LIFETIME": 60,
+                "MAX_IDLE": 60,
+                "CHECK_INTERVAL": 60,
+                **options,
+            },
+        )
+
+    def test_concurrent_checkouts_respect_max_size(self):
+        pool = self.make_pool(TIMEOUT=5)
+        errors = []
+
+        def work():
+            for _ in range(20):
+                try:
+                    connection = pool.checkout(self.connect)
+                    time.sleep(0.001)
+                    pool.checkin(connection)
+                except db_pool.PoolTimeout as error:
+                    errors.append(error)
+
+        threads = [threading.Thread(target=work) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.snapshot()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(self.created), 3)
+        self.assertLessEqual(stats["peak_in_use"], 3)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["checkouts"], 200)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = self.make_pool()
+        leased = [pool.checkout(self.connect) for _ in range(3)]
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.checkout(self.connect)
+        self.assertEqual(pool.snapshot()["timeouts"], 1)
+        for connection in leased:
+            pool.checkin(connection)
+
+    def test_checkin_rolls_back_open_transaction(self):
+        pool = self.make_pool()
+        connection = pool.checkout(self.connect)
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.checkin(connection)
+        self.assertEqual(
+            connection.info.transaction_status, TRANSACTION_STATUS_IDLE
+        )
+        self.assertFalse(connection.closed)
+        self.assertIs(pool.checkout(self.connect), connection)
+
+    def test_broken_connection_is_replaced(self):
+        pool = self.make_pool()
+        connection = pool.checkout(self.connect)
+        pool.checkin(connection)
+        connection.closed = 1
+        replacement = pool.checkout(self.connect)
+        self.assertIsNot(replacement, connection)
+        self.assertFalse(replacement.closed)
+        self.assertEqual(pool.closed["broken"], 1)
+
+    def test_health_check_after_interval(self):
+        pool = self.make_pool(CHECK_INTERVAL=0)
+        connection = pool.checkout(self.connect)
+        pool.checkin(connection)
+        self.assertIs(pool.checkout(self.connect), connection)
+        self.assertEqual(connection.pings, 1)
+
+    def test_idle_and_lifetime_expiry(self):
+        pool = self.make_pool(MAX_IDLE=0)
+        connection = pool.checkout(self.connect)
+        pool.checkin(connection)
+        self.assertIsNot(pool.checkout(self.connect), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.closed["idle"], 1)
+
+        pool = self.make_pool(MAX_LIFETIME=0)
+        connection = pool.checkout(self.connect)
+        pool.checkin(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.closed["lifetime"], 1)
+
+    def test_published_stats_are_collected(self):
+        pool = self.make_pool()
+        db_pool.publish(pool)
+        other = {**pool.snapshot(), "pid": os.getpid() + 1}
+        with open(
+            os.path.join(self.stats_dir, "other.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(other, f)
+        stale = os.path.join(self.stats_dir, "stale.json")
+        with open(stale, "w", encoding="utf-8") as f:
+            json.dump({**other, "pid": os.getpid() + 2}, f)
+        os.utime(stale, (0, 0))
+        pids = sorted(stats["pid"] for stats in db_pool.read_published())
+        self.assertEqual(pids, [os.getpid(), os.getpid() + 1])
+        self.assertFalse(os.path.exists(stale))
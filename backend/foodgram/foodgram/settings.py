@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -26,9 +27,11 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
+    "sorl.thumbnail",
 ]
 
 MIDDLEWARE = [
+    "api.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -60,17 +63,54 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "users.User"
 
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "foodgram.db" if DB_POOL else "django.db.backends.postgresql"
+        ),
         "NAME": os.getenv("POSTGRES_DB", "django"),
         "USER": os.getenv("POSTGRES_USER", "django"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", ""),
         "PORT": os.getenv("DB_PORT", 5432),
+        "POOL": {
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 5)),
+            "MAX_LIFETIME": int(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+            "MAX_IDLE": int(os.getenv("DB_POOL_MAX_IDLE", 300)),
+            "CHECK_INTERVAL": int(os.getenv("DB_POOL_CHECK_INTERVAL", 30)),
+        },
+    }
+}
+DB_POOL_STATS_INTERVAL = 10
+DB_POOL_STATS_DIR = os.getenv(
+    "DB_POOL_STATS_DIR", os.path.join(tempfile.gettempdir(), "foodgram_db_pool")
+)
+
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "foodgram"),
+    "file": (
+        "foodgram.cache.FileBasedCache",
+        os.path.join(tempfile.gettempdir(), "foodgram_cache"),
+    ),
+    "redis": ("django_redis.cache.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND][0],
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", CACHE_BACKENDS[CACHE_BACKEND][1]
+        ),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", 300)),
     }
 }
 
+RESPONSE_CACHE_ALIAS = "default"
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -105,6 +145,28 @@ STATIC_ROOT = os.path.join(BASE_DIR, "collected_static")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+THUMBNAIL_BACKEND = "recipe.images.VariantBackend"
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+RECIPE_IMAGE_VARIANTS = {
+    "small": ("160x160", {"crop": "center"}),
+    "medium": ("480x480", {"crop": "center"}),
+    "large": ("1280x1280", {"upscale": False}),
+}
+
+INGREDIENT_INDEX_PATH = os.getenv(
+    "INGREDIENT_INDEX_PATH", os.path.join(BASE_DIR, "ingredient_index.bin")
+)
+
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "True") == "True"
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "False") == "True"
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", 3))
+SLOW_REQUEST_EXPLAIN = os.getenv("SLOW_REQUEST_EXPLAIN", "False") == "True"
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", 10))
+
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False") == "True"
+
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
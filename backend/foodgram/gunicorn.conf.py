@@ -0,0 +1,77 @@
+import os
+
+WORKERS_PER_CPU = {
+    "sync": lambda cpus: 2 * cpus + 1,
+    "gthread": lambda cpus: cpus + 1,
+    "uvicorn.workers.UvicornWorker": lambda cpus: cpus,
+}
+THREADS_PER_WORKER = {
+    "gthread": 4,
+}
+APPS = {
+    "uvicorn.workers.UvicornWorker": "foodgram.asgi:application",
+}
+
+
+def cpu_count():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            return cpus
+    if quota in ("max", "-1"):
+        return cpus
+    return max(1, min(cpus, int(quota) // int(period)))
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS") or 0) or THREADS_PER_WORKER.get(
+    worker_class, 1
+)
+workers = int(os.getenv("GUNICORN_WORKERS") or 0) or WORKERS_PER_CPU.get(
+    worker_class, WORKERS_PER_CPU["sync"]
+)(cpu_count())
+wsgi_app = os.getenv(
+    "GUNICORN_APP", APPS.get(worker_class, "foodgram.wsgi:application")
+)
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and os.getenv("CACHE_BACKEND") == "locmem":
+        raise RuntimeError(
+            "CACHE_BACKEND=locmem не разделяется между процессами; "
+            "при нескольких воркерах используйте file или redis."
+        )
+    if server.cfg.preload_app:
+        from api.warmup import PRELOAD_STEPS, warmup
+
+        server.log.info(
+            "Прогрев завершен, мс: %s", warmup(PRELOAD_STEPS)
+        )
+
+
+def post_worker_init(worker):
+    from api.warmup import STEPS, WORKER_STEPS, warmup
+
+    steps = WORKER_STEPS if worker.cfg.preload_app else STEPS
+    worker.log.info("Прогрев воркера завершен, мс: %s", warmup(steps))
@@ -1,4 +1,7 @@
 from django.contrib import admin
+from foodgram.paginator import EstimatedCountPaginator
+
+from .counters import recount
 from .models import (
     Ingredient,
     Recipe,
@@ -6,9 +9,46 @@ from .models import (
     IngredientInRecipe,
     Favorite,
     ShoppingCart,
+    ShoppingListItem,
 )
 
 
+class CountersAdminMixin:
+    def get_affected(self, obj, deleting):
+        return {}
+
+    def collect(self, objects, deleting=False, affected=None):
+        affected = {} if affected is None else affected
+        for obj in objects:
+            for name, pks in self.get_affected(obj, deleting).items():
+                affected.setdefault(name, set()).update(pks)
+        return affected
+
+    def sync(self, affected):
+        user_ids = affected.pop("shopping_lists", None)
+        for name, pks in affected.items():
+            recount(name, pks)
+        if user_ids:
+            ShoppingListItem.objects.rebuild(user_ids)
+
+    def save_model(self, request, obj, form, change):
+        affected = self.collect(
+            self.model.objects.filter(pk=obj.pk) if change else ()
+        )
+        super().save_model(request, obj, form, change)
+        self.sync(self.collect([obj], affected=affected))
+
+    def delete_model(self, request, obj):
+        affected = self.collect([obj], deleting=True)
+        super().delete_model(request, obj)
+        self.sync(affected)
+
+    def delete_queryset(self, request, queryset):
+        affected = self.collect(queryset, deleting=True)
+        super().delete_queryset(request, queryset)
+        self.sync(affected)
+
+
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = (
@@ -16,20 +56,23 @@ class IngredientAdmin(admin.ModelAdmin):
         "measurement_unit",
     )
     search_fields = ("name",)
-    list_filter = ("name",)
     empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ("name", "color", "slug")
+    search_fields = ("name", "slug")
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = ("name", "author", "pub_date", "display_tags", "favorite")
-    list_filter = ("name", "author", "tags")
-    search_fields = ("name",)
+    list_filter = ("tags",)
+    search_fields = ("name", "=author__username", "=author__email")
+    autocomplete_fields = ("author", "tags")
     readonly_fields = ("favorite",)
     fields = (
         "image",
@@ -38,6 +81,17 @@ class RecipeAdmin(admin.ModelAdmin):
         ("tags", "cooking_time"),
         "favorite",
     )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("author")
+            .prefetch_related("tags")
+            .defer("search_vector")
+        )
 
     def display_tags(self, obj):
         return ", ".join([tag.name for tag in obj.tags.all()])
@@ -45,21 +99,66 @@ class RecipeAdmin(admin.ModelAdmin):
     display_tags.short_description = "Теги"
 
     def favorite(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
     favorite.short_description = "B избранном"
+    favorite.admin_order_field = "favorites_count"
+
+    def get_affected(self, obj, deleting):
+        affected = {"recipes": [obj.author_id]}
+        if deleting:
+            user_ids = ShoppingListItem.objects.cart_user_ids(obj)
+            affected["shopping_lists"] = user_ids
+        return affected
 
 
 @admin.register(IngredientInRecipe)
-class IngredientInRecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = ("recipe", "ingredient", "amount")
+    list_select_related = ("recipe", "ingredient")
+    autocomplete_fields = ("recipe", "ingredient")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_affected(self, obj, deleting):
+        return {
+            "shopping_lists": ShoppingCart.objects.filter(
+                recipe_id=obj.recipe_id
+            ).values_list("user_id", flat=True)
+        }
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = ("recipe", "user")
+    list_select_related = ("recipe", "user")
+    autocomplete_fields = ("recipe", "user")
+    search_fields = ("=user__username", "=user__email")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_affected(self, obj, deleting):
+        return {"favorites": [obj.recipe_id]}
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = ("recipe", "user")
+    list_select_related = ("recipe", "user")
+    autocomplete_fields = ("recipe", "user")
+    search_fields = ("=user__username", "=user__email")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_affected(self, obj, deleting):
+        return {"carts": [obj.recipe_id], "shopping_lists": [obj.user_id]}
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ("user", "ingredient", "amount")
+    list_select_related = ("user", "ingredient")
+    autocomplete_fields = ("user", "ingredient")
+    search_fields = ("=user__username", "=user__email")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,69 @@
+import csv
+from itertools import islice
+
+from django.db import connections, models
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class CSVStream:
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = ""
+
+    def write(self, value):
+        self.buffer += value
+
+    def read(self, size=-1):
+        writer = csv.writer(self)
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            writer.writerow(row)
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def write_rows(model, fields, rows, using="default", batch_size=5000):
+    connection = connections[using]
+    fields = [model._meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    converters = [
+        field.get_db_prep_save
+        if isinstance(field, models.DateTimeField)
+        else None
+        for field in fields
+    ]
+    if any(converters):
+        rows = (
+            tuple(
+                value if convert is None else convert(value, connection)
+                for convert, value in zip(converters, row)
+            )
+            for row in rows
+        )
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                CSVStream(iter(rows)),
+            )
+            return
+        placeholders = ", ".join(["%s"] * len(fields))
+        for batch in batched(rows, batch_size):
+            cursor.executemany(
+                f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                batch,
+            )
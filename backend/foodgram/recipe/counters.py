@@ -0,0 +1,68 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from recipe.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+from .signals import counters_changed
+
+COUNTERS = {
+    "favorites": (Recipe, "favorites_count", Favorite, "recipe"),
+    "carts": (Recipe, "in_carts_count", ShoppingCart, "recipe"),
+    "recipes": (User, "recipes_count", Recipe, "author"),
+    "followers": (User, "followers_count", Follow, "user"),
+}
+RELATION_COUNTERS = {
+    Favorite: "favorites",
+    ShoppingCart: "carts",
+}
+
+
+def change_counter(name, pks, delta):
+    model, field, _, _ = COUNTERS[name]
+    if model.objects.filter(pk__in=pks).update(**{field: F(field) + delta}):
+        counters_changed.send(sender=model, name=name)
+
+
+def expected_count(name):
+    _, _, related, related_field = COUNTERS[name]
+    return Coalesce(
+        Subquery(
+            related.objects.filter(**{related_field: OuterRef("pk")})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def find_drift(name, pks):
+    model, field, _, _ = COUNTERS[name]
+    return list(
+        model.objects.filter(pk__in=pks)
+        .annotate(expected=expected_count(name))
+        .exclude(**{field: F("expected")})
+        .values_list("pk", field, "expected")
+    )
+
+
+def recount(name, pks):
+    model, field, _, _ = COUNTERS[name]
+    if model.objects.filter(pk__in=pks).update(
+        **{field: expected_count(name)}
+    ):
+        counters_changed.send(sender=model, name=name)
+
+
+def iter_pk_batches(model, batch_size):
+    last = None
+    while True:
+        queryset = model.objects.order_by("pk")
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
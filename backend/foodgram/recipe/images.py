@@ -0,0 +1,95 @@
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_IMAGE = "recipe/bench.png"
+KNOWN_VARIANTS_LIMIT = 100000
+
+_known_variants = set()
+
+
+def variant_name(name, variant):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    extension = EXTENSIONS[thumbnail_settings.THUMBNAIL_FORMAT]
+    return posixpath.join(
+        thumbnail_settings.THUMBNAIL_PREFIX,
+        directory,
+        f"{stem}_{variant}.{extension}",
+    )
+
+
+class VariantBackend(ThumbnailBackend):
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        variant = options.get("variant")
+        if variant is None:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options
+            )
+        return variant_name(source.name, variant)
+
+
+def get_variant(image, name):
+    geometry, options = settings.RECIPE_IMAGE_VARIANTS[name]
+    return get_thumbnail(image, geometry, variant=name, **options)
+
+
+def get_variants(image):
+    if not image:
+        return {}
+    return {
+        name: get_variant(image, name)
+        for name in settings.RECIPE_IMAGE_VARIANTS
+    }
+
+
+def variant_exists(storage, name):
+    if name in _known_variants:
+        return True
+    if not storage.exists(name):
+        return False
+    if len(_known_variants) < KNOWN_VARIANTS_LIMIT:
+        _known_variants.add(name)
+    return True
+
+
+def get_variant_url(image, name):
+    variant = variant_name(image.name, name)
+    if not variant_exists(image.storage, variant):
+        return image.storage.url(image.name)
+    return image.storage.url(variant)
+
+
+def get_variant_urls(image):
+    if not image:
+        return {}
+    return {
+        name: get_variant_url(image, name)
+        for name in settings.RECIPE_IMAGE_VARIANTS
+    }
+
+
+def create_variants(image):
+    try:
+        get_variants(image)
+    except Exception:
+        logger.exception("Не удалось создать варианты изображения %s", image)
+
+
+def ensure_image():
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 900), "#e26c2d").save(buffer, "PNG")
+        default_storage.save(PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue()))
+    create_variants(PLACEHOLDER_IMAGE)
+    return PLACEHOLDER_IMAGE
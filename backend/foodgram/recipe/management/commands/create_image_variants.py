@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipe.images import get_variants
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Создаёт недостающие варианты изображений рецептов."
+
+    def handle(self, *args, **options):
+        processed = 0
+        images = (
+            Recipe.objects.exclude(image="")
+            .order_by("image")
+            .values_list("image", flat=True)
+            .distinct()
+        )
+        field = Recipe._meta.get_field("image")
+        for name in images.iterator():
+            get_variants(field.attr_class(None, field, name))
+            processed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано изображений: {processed}.")
+        )
@@ -1,20 +1,193 @@
 import csv
+import json
+import os
 
-from django.core.management.base import BaseCommand
-from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipe.bulk import CSVStream, batched
 from recipe.models import Ingredient
+from recipe.signals import bulk_changed
 
+DEFAULT_PATH = os.path.join(
+    settings.BASE_DIR, "recipe", "data", "ingredients.csv"
+)
 
-ContentType.objects.all().delete()
+
+def read_csv(f):
+    for row in csv.reader(f):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+def read_json(f, chunk_size=65536):
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("JSON-файл должен содержать массив объектов.")
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError("Некорректный JSON-файл.")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item["name"], item["measurement_unit"]
+
+
+READERS = {
+    ".csv": read_csv,
+    ".json": read_json,
+}
 
 
 class Command(BaseCommand):
+    help = "Загружает ингредиенты из CSV- или JSON-файла."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=DEFAULT_PATH)
+        parser.add_argument(
+            "--format",
+            choices=[suffix.lstrip(".") for suffix in READERS],
+            help="Формат файла; по умолчанию определяется по расширению.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--method",
+            choices=("auto", "bulk", "copy"),
+            default="auto",
+            help="copy доступен только для PostgreSQL.",
+        )
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help=(
+                "Обновить единицу измерения, если ингредиент с таким "
+                "названием единственный и в файле указана другая единица. "
+                "Файл сверяется с базой пакетами по --batch-size строк."
+            ),
+        )
+
     def handle(self, *args, **options):
-        with open("recipe/data/ingredients.csv", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=measurement_unit
+        self.verbosity = options["verbosity"]
+        path = options["path"]
+        suffix = (
+            f".{options['format']}"
+            if options["format"]
+            else os.path.splitext(path)[1].lower()
+        )
+        if suffix not in READERS:
+            raise CommandError(f"Неподдерживаемый формат файла: {path}")
+        method = options["method"]
+        if method == "auto":
+            method = "copy" if connection.vendor == "postgresql" else "bulk"
+        if method == "copy" and connection.vendor != "postgresql":
+            raise CommandError("COPY поддерживается только PostgreSQL.")
+
+        before = Ingredient.objects.count()
+        with open(path, encoding="utf-8") as f, transaction.atomic():
+            rows = READERS[suffix](f)
+            if options["upsert"]:
+                updated = self.upsert(rows, options["batch_size"])
+            else:
+                updated = 0
+                if method == "copy":
+                    self.copy(self.counted(rows, options["batch_size"]))
+                else:
+                    self.bulk_insert(rows, options["batch_size"])
+            bulk_changed.send(sender=Ingredient)
+        created = Ingredient.objects.count() - before
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: добавлено {created}, обновлено {updated}."
+            )
+        )
+
+    def progress(self, processed):
+        if self.verbosity > 1 or processed % 50000 == 0:
+            self.stdout.write(f"Обработано строк: {processed}")
+
+    def counted(self, rows, step):
+        processed = 0
+        for processed, row in enumerate(rows, 1):
+            yield row
+            if processed % step == 0:
+                self.progress(processed)
+        if processed % step:
+            self.progress(processed)
+
+    def bulk_insert(self, rows, batch_size):
+        processed = 0
+        for batch in batched(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ],
+                ignore_conflicts=True,
+            )
+            processed += len(batch)
+            self.progress(processed)
+
+    def copy(self, rows):
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE ingredient_load "
+                "(name text, measurement_unit text) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                "COPY ingredient_load (name, measurement_unit) "
+                "FROM STDIN WITH (FORMAT csv)",
+                CSVStream(rows),
+            )
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit FROM ingredient_load "
+                "ON CONFLICT DO NOTHING"
+            )
+
+    def upsert(self, rows, batch_size):
+        processed = updated = 0
+        for batch in batched(rows, batch_size):
+            units = {}
+            for name, measurement_unit in batch:
+                units.setdefault(name, set()).add(measurement_unit)
+            existing = {}
+            for ingredient in Ingredient.objects.filter(name__in=units):
+                existing.setdefault(ingredient.name, []).append(ingredient)
+            changed = []
+            new = []
+            for name, file_units in units.items():
+                current = existing.get(name, [])
+                current_units = {
+                    ingredient.measurement_unit for ingredient in current
+                }
+                if (
+                    len(current) == 1
+                    and len(file_units) == 1
+                    and current_units != file_units
+                ):
+                    current[0].measurement_unit = next(iter(file_units))
+                    changed.append(current[0])
+                    continue
+                new.extend(
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for measurement_unit in file_units - current_units
                 )
-                self.stdout.write(f"{name}, {measurement_unit}")
+            Ingredient.objects.bulk_update(changed, ["measurement_unit"])
+            Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+            updated += len(changed)
+            processed += len(batch)
+            self.progress(processed)
+        return updated
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipe.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает или проверяет сводные списки покупок."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            type=int,
+            dest="user_ids",
+            help="Обработать только указанного пользователя (id).",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Только сравнить сохраненные суммы с корзинами.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+        if options["verify"]:
+            expected = ShoppingListItem.objects.expected(user_ids)
+            stored = ShoppingListItem.objects.stored(user_ids)
+            mismatches = [
+                (key, expected.get(key), stored.get(key))
+                for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)
+            ]
+            for (user_id, ingredient_id), want, got in sorted(
+                mismatches, key=lambda mismatch: mismatch[0]
+            ):
+                self.stdout.write(
+                    f"user={user_id} ingredient={ingredient_id}: "
+                    f"ожидается {want}, сохранено {got}"
+                )
+            if mismatches:
+                raise CommandError(f"Расхождений: {len(mismatches)}")
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+            return
+        with transaction.atomic():
+            ShoppingListItem.objects.rebuild(
+                user_ids, batch_size=options["batch_size"]
+            )
+        self.stdout.write(self.style.SUCCESS("Списки покупок пересчитаны."))
@@ -1,14 +1,20 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import (
     MinValueValidator,
     RegexValidator,
     MaxValueValidator,
 )
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models, router, transaction
+from django.db.models import Case, F, Sum, UniqueConstraint, Value, When
+
+from .images import create_variants
 
 User = get_user_model()
 
+SEARCH_CONFIG = "russian"
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -70,6 +76,9 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name="Дата публикации", auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True
+    )
     text = models.TextField(verbose_name="Описание рецепта")
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -92,15 +101,49 @@ class Recipe(models.Model):
             ),
         ],
     )
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок", default=0, editable=False
+    )
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            GinIndex(fields=["search_vector"], name="recipe_search_vector"),
+        ]
 
     def __str__(self):
         return f"{self.name[:50]}"
 
+    def save(self, *args, **kwargs):
+        image_uploaded = self.image and not self.image._committed
+        super().save(*args, **kwargs)
+        if image_uploaded:
+            image = self.image
+            transaction.on_commit(lambda: create_variants(image))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"name", "text"} & set(update_fields):
+            self.update_search_vector(kwargs.get("using"))
+
+    def update_search_vector(self, using=None):
+        using = using or self._state.db
+        if connections[using].vendor != "postgresql":
+            return
+        Recipe.objects.using(using).filter(pk=self.pk).update(
+            search_vector=search_vector()
+        )
+
+
+def search_vector():
+    return SearchVector(
+        "name", weight="A", config=SEARCH_CONFIG
+    ) + SearchVector("text", weight="B", config=SEARCH_CONFIG)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -139,6 +182,49 @@ class IngredientInRecipe(models.Model):
         )
 
 
+class UserRecipeManager(models.Manager):
+    def execute_returning(self, sql, params):
+        using = router.db_for_write(self.model)
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def sql_names(self):
+        quote = connections[router.db_for_write(self.model)].ops.quote_name
+        opts = self.model._meta
+        return (
+            quote(opts.db_table),
+            quote(opts.get_field("user").column),
+            quote(opts.get_field("recipe").column),
+            quote(Recipe._meta.db_table),
+        )
+
+    def add(self, user, recipe_ids):
+        if not recipe_ids:
+            return []
+        table, user_column, recipe_column, recipes = self.sql_names()
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        return self.execute_returning(
+            f"INSERT INTO {table} ({user_column}, {recipe_column}) "
+            f"SELECT %s, id FROM {recipes} "
+            f"WHERE id IN ({placeholders}) "
+            f"ON CONFLICT DO NOTHING RETURNING {recipe_column}",
+            [user.pk, *recipe_ids],
+        )
+
+    def remove(self, user, recipe_ids):
+        if not recipe_ids:
+            return []
+        table, user_column, recipe_column, _ = self.sql_names()
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        return self.execute_returning(
+            f"DELETE FROM {table} WHERE {user_column} = %s "
+            f"AND {recipe_column} IN ({placeholders}) "
+            f"RETURNING {recipe_column}",
+            [user.pk, *recipe_ids],
+        )
+
+
 class BaseFavShopModel(models.Model):
     user = models.ForeignKey(
         User,
@@ -153,6 +239,8 @@ class BaseFavShopModel(models.Model):
         related_name="%(class)s",
     )
 
+    objects = UserRecipeManager()
+
     class Meta:
         abstract = True
 
@@ -180,3 +268,159 @@ class ShoppingCart(BaseFavShopModel):
                 name="unique recipe in shopping cart",
             ),
         ]
+
+
+class ShoppingListItemManager(models.Manager):
+    def recipes_amounts(self, recipes):
+        return dict(
+            IngredientInRecipe.objects.filter(recipe__in=recipes)
+            .order_by()
+            .values("ingredient_id")
+            .annotate(total=Sum("amount"))
+            .values_list("ingredient_id", "total")
+        )
+
+    def cart_user_ids(self, recipe):
+        return list(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                "user_id", flat=True
+            )
+        )
+
+    def apply_deltas(self, user_ids, deltas):
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items()
+            if delta
+        }
+        if not user_ids or not deltas:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        items.update(
+            amount=F("amount")
+            + Case(
+                *[
+                    When(ingredient_id=ingredient_id, then=Value(delta))
+                    for ingredient_id, delta in deltas.items()
+                ],
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
+        items.filter(amount__lte=0).delete()
+
+    def add_recipes(self, recipes, user_ids):
+        self.apply_deltas(user_ids, self.recipes_amounts(recipes))
+
+    def remove_recipe(self, recipe, user_ids):
+        self.remove_recipes([recipe], user_ids)
+
+    def remove_recipes(self, recipes, user_ids):
+        self.apply_deltas(
+            user_ids,
+            {
+                ingredient_id: -amount
+                for ingredient_id, amount in self.recipes_amounts(
+                    recipes
+                ).items()
+            },
+        )
+
+    def update_amounts(self, old_amounts, new_amounts, user_ids):
+        self.apply_deltas(
+            user_ids,
+            {
+                ingredient_id: (
+                    new_amounts.get(ingredient_id, 0)
+                    - old_amounts.get(ingredient_id, 0)
+                )
+                for ingredient_id in old_amounts.keys() | new_amounts.keys()
+            },
+        )
+
+    def expected(self, user_ids=None):
+        carts = ShoppingCart.objects.all()
+        if user_ids is not None:
+            carts = carts.filter(user__in=user_ids)
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in carts.filter(
+                recipe__ingredient_in__isnull=False
+            )
+            .values("user", "recipe__ingredient_in__ingredient")
+            .annotate(full_amount=Sum("recipe__ingredient_in__amount"))
+            .values_list(
+                "user", "recipe__ingredient_in__ingredient", "full_amount"
+            )
+            .order_by()
+        }
+
+    def stored(self, user_ids=None):
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user__in=user_ids)
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in items.values_list(
+                "user_id", "ingredient_id", "amount"
+            ).order_by()
+        }
+
+    def rebuild(self, user_ids=None, batch_size=1000):
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user__in=user_ids)
+        items.delete()
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=amount
+                )
+                for (user_id, ingredient_id), amount in self.expected(
+                    user_ids
+                ).items()
+            ],
+            batch_size=batch_size,
+        )
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="shopping_list",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+        related_name="+",
+    )
+    amount = models.IntegerField(verbose_name="Количество")
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = "Ингредиент в списке покупок"
+        verbose_name_plural = "Список покупок"
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique ingredient in shopping list",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient}, {self.amount}"
@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+bulk_changed = Signal()
+counters_changed = Signal()
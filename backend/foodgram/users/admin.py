@@ -1,22 +1,57 @@
 from django.contrib.admin import register
 from django.contrib.auth.admin import UserAdmin
 from django.contrib import admin
-
+from foodgram.paginator import EstimatedCountPaginator
+from recipe.admin import CountersAdminMixin
+from recipe.models import Favorite, ShoppingCart
 from users.models import User, Follow
 
 
 @register(User)
-class CustomUserAmin(UserAdmin):
-    list_display = ("username", "email", "first_name", "last_name")
-    list_filter = ("username", "email")
+class CustomUserAmin(CountersAdminMixin, UserAdmin):
+    list_display = (
+        "username",
+        "email",
+        "first_name",
+        "last_name",
+        "recipes_count",
+        "followers_count",
+    )
+    list_filter = ("is_staff", "is_active")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_affected(self, obj, deleting):
+        if not deleting:
+            return {}
+        return {
+            "favorites": Favorite.objects.filter(user=obj).values_list(
+                "recipe_id", flat=True
+            ),
+            "carts": ShoppingCart.objects.filter(user=obj).values_list(
+                "recipe_id", flat=True
+            ),
+            "followers": Follow.objects.filter(author=obj).values_list(
+                "user_id", flat=True
+            ),
+            "shopping_lists": ShoppingCart.objects.filter(
+                recipe__author=obj
+            ).values_list("user_id", flat=True),
+        }
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = (
         "user",
         "author",
     )
-    search_fields = ("user__username", "author__username")
-    list_filter = ("user", "author")
+    list_select_related = ("user", "author")
+    search_fields = ("=user__username", "=author__username")
+    autocomplete_fields = ("user", "author")
     empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_affected(self, obj, deleting):
+        return {"followers": [obj.user_id]}
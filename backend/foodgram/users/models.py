@@ -25,6 +25,12 @@ class User(AbstractUser):
         verbose_name="Фамилия",
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Подписчиков", default=0, editable=False
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ("username", "first_name", "last_name")